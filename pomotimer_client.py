@@ -0,0 +1,250 @@
+"""
+The part of pomotimer a command that only talks to a running timer needs: the daemon's
+socket, the status file and how both are shown. It imports little, so the pomotimer
+entry point runs status, pause and stop without loading pomotimer_core, which imports
+its names from here.
+"""
+import math
+import mmap
+import os
+import stat
+import struct
+import sys
+import time
+
+# Set POMOTIMER_DEBUG=1 to print timing statistics on exit
+debug_mode = bool(os.environ.get('POMOTIMER_DEBUG'))
+debug_stats = {}
+
+# --- UI & Style Constants ---
+class Colors:
+    PURPLE = '\x1b[95m'
+    BLUE = '\x1b[94m'
+    GREEN = '\x1b[92m'
+    YELLOW = '\x1b[93m'
+    RED = '\x1b[91m'
+    BOLD = '\x1b[1m'
+    ENDC = '\x1b[0m'
+
+# --- Status File ---
+COUNTING_PHASES = ('work', 'break', 'countdown')
+WAITING_PHASES = ('break-wait', 'work-wait', 'overdue')
+FINAL_PHASES = ('done', 'stopped')
+# The status record: a sequence number, odd while a write is in progress, then the
+# version, phase, paused, autostart, clock id and kind bytes, the session index and
+# count, the deadline, remaining time (while paused) and phase start in ns on the
+# given clock, the planned seconds and the writer's pid
+STATUS_SEQ = struct.Struct('<I')
+STATUS_BODY = struct.Struct('<BBBBBBxxIIqqqII')
+STATUS_SIZE = STATUS_SEQ.size + STATUS_BODY.size
+STATUS_VERSION = 1
+STATUS_PHASES = ('idle', 'work', 'break', 'countdown', 'break-wait', 'work-wait', 'overdue', 'ask-continue')
+STATUS_KINDS = ('', 'tcount', 'tpom')
+# Give up on a record that stays mid-write this many reads, e.g. its writer died
+STATUS_READ_ATTEMPTS = 1000
+
+def runtime_path(name):
+    """A per-user runtime file, in $XDG_RUNTIME_DIR or a private directory under /tmp"""
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or f"/tmp/pomotimer-{os.getuid()}"
+    return os.path.join(runtime_dir, name)
+
+def status_path():
+    return runtime_path('pomotimer.status')
+
+def ensure_private_dir(path, create=True):
+    """
+    Make sure path is a directory only this user can get into, creating it if need be.
+    The /tmp fallback has a predictable name, so another user may have created it first
+    to plant a socket or a symlink there; raises PermissionError if so.
+    """
+    if create:
+        try:
+            os.mkdir(path, 0o700)
+        except FileExistsError:
+            pass
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f"{path} is not a private directory of this user (owner and mode 0700)")
+
+class StatusReader:
+    """
+    Reads the status record. After the file is mapped, a read is a few memory loads and
+    a clock read, with no system calls; it's retried while the sequence number shows a
+    write in progress or changed meanwhile.
+    """
+
+    def __init__(self, path=None):
+        path = path or status_path()
+        ensure_private_dir(os.path.dirname(path), create=False)
+        fd = os.open(path, os.O_RDONLY | os.O_NOFOLLOW)
+        try:
+            self.map = mmap.mmap(fd, STATUS_SIZE, prot=mmap.PROT_READ)
+        finally:
+            os.close(fd)
+
+    def read(self):
+        """The running timer as a dict like the daemon's snapshots, or None if there is none"""
+        for _ in range(STATUS_READ_ATTEMPTS):
+            seq = STATUS_SEQ.unpack_from(self.map, 0)[0]
+            if seq & 1:
+                continue
+            body = STATUS_BODY.unpack_from(self.map, STATUS_SEQ.size)
+            if STATUS_SEQ.unpack_from(self.map, 0)[0] == seq:
+                break
+        else:
+            return None
+        version, phase, paused, autostart, clock, kind, session, sessions, deadline_ns, remaining_ns, started_ns, total, pid = body
+        if version != STATUS_VERSION or not 0 < phase < len(STATUS_PHASES):
+            return None
+        now_ns = time.clock_gettime_ns(clock)
+        phase = STATUS_PHASES[phase]
+        return {
+            'phase': phase,
+            'kind': STATUS_KINDS[kind] if kind < len(STATUS_KINDS) else '',
+            'session': session,
+            'sessions': sessions,
+            'paused': bool(paused),
+            'autostart': bool(autostart),
+            'total': total,
+            'remaining': (remaining_ns if paused else max(deadline_ns - now_ns, 0)) / 1e9,
+            'overdue': (now_ns - started_ns) / 1e9 if phase in WAITING_PHASES else 0.0,
+            'pid': pid,
+        }
+
+    def close(self):
+        self.map.close()
+
+def read_status(path=None):
+    """One-off read of the status record; None if no timer is running"""
+    try:
+        reader = StatusReader(path)
+    except (OSError, ValueError):
+        return None
+    try:
+        return reader.read()
+    finally:
+        reader.close()
+
+# --- Formatting ---
+TWO_DIGITS = tuple(f"{n:02d}" for n in range(100))
+
+def format_clock(seconds):
+    """MM:SS"""
+    mins, secs = divmod(seconds, 60)
+    return (TWO_DIGITS[mins] if mins < 100 else str(mins)) + ':' + TWO_DIGITS[secs]
+
+def format_duration(seconds):
+    """HH:MM:SS"""
+    hours, rem = divmod(seconds, 3600)
+    mins, secs = divmod(rem, 60)
+    return (TWO_DIGITS[hours] if hours < 100 else str(hours)) + ':' + TWO_DIGITS[mins] + ':' + TWO_DIGITS[secs]
+
+# --- Daemon Client ---
+def daemon_socket_path():
+    return runtime_path('pomotimer.sock')
+
+def encode_message(message):
+    import json
+    return (json.dumps(message, separators=(',', ':')) + '\n').encode()
+
+def daemon_connect():
+    """Connect to the daemon; returns None if none is running"""
+    path = daemon_socket_path()
+    try:
+        # A socket in someone else's directory may not be our daemon's
+        ensure_private_dir(os.path.dirname(path), create=False)
+    except OSError:
+        return None
+    # Only the daemon commands pay for socket and json (which loads re); status --format,
+    # polled by prompts, reads the status file without them
+    import socket
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+def daemon_request(request):
+    """Send one request to the daemon and return its reply, or None if no daemon is running"""
+    started = time.perf_counter()
+    sock = daemon_connect()
+    if sock is None:
+        return None
+    with sock:
+        sock.sendall(encode_message(request))
+        reply = sock.makefile('rb').readline()
+    # Interpreter startup dominates a client call, so record its CPU time as well
+    debug_stats['client_roundtrip_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    debug_stats['client_cpu_ms'] = round(time.process_time() * 1000, 3)
+    import json
+    try:
+        return json.loads(reply)
+    except ValueError:
+        return None
+
+def describe_timer(timer):
+    """One status line for a timer snapshot"""
+    phase = timer['phase']
+    if phase in COUNTING_PHASES:
+        detail = format_clock(math.ceil(timer['remaining'])) + (" paused" if timer['paused'] else " left")
+    elif phase in WAITING_PHASES:
+        detail = "overdue " + format_duration(int(timer['overdue']))
+    else:
+        detail = ""
+    session = f" {timer['session']}/{timer['sessions']}" if timer['kind'] == 'tpom' else ""
+    return f"{Colors.BOLD}{timer['name']}{Colors.ENDC}  {phase}{session}  {detail}".rstrip()
+
+def daemon_reply(request):
+    """A successful reply from the daemon; exits with a message otherwise"""
+    reply = daemon_request(request)
+    if reply is None:
+        print(f"{Colors.YELLOW}No pomotimer daemon is running. Start one with: pomotimer daemon{Colors.ENDC}")
+        sys.exit(1)
+    if not reply.get('ok'):
+        print(f"{Colors.RED}Error: {reply.get('error')}{Colors.ENDC}")
+        sys.exit(1)
+    return reply
+
+def format_status(template):
+    """Fill a --format template from the status file; empty if no timer is running"""
+    timer = read_status()
+    if timer is None:
+        return ''
+    try:
+        os.kill(timer['pid'], 0)
+    except ProcessLookupError:
+        return ''  # Left behind by a timer that didn't exit cleanly
+    except PermissionError:
+        pass
+    total = timer['total']
+    remaining = math.ceil(timer['remaining'])
+    return template.format(
+        phase=timer['phase'],
+        kind=timer['kind'],
+        session=timer['session'],
+        sessions=timer['sessions'],
+        remaining=format_clock(remaining),
+        overdue=format_clock(int(timer['overdue'])),
+        percentage=int((total - remaining) / total * 100) if total > 0 and timer['phase'] in COUNTING_PHASES else 0,
+        paused="paused" if timer['paused'] else "",
+        autostart="on" if timer['autostart'] else "off",
+    )
+
+def run_status_format(template):
+    try:
+        print(format_status(template))
+    except (KeyError, IndexError, ValueError) as e:
+        print(f"{Colors.RED}Error: Invalid status format: {e}{Colors.ENDC}")
+        sys.exit(1)
+
+def run_client_command(command, name=None):
+    if command == 'status':
+        timers = daemon_reply({'cmd': 'status'})['timers']
+        if not timers:
+            print("No timers running.")
+        for timer in timers:
+            print(describe_timer(timer))
+    else:
+        print(describe_timer(daemon_reply({'cmd': command, 'name': name})['timer']))
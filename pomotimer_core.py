@@ -0,0 +1,3466 @@
+#!/usr/bin/env python3
+import argparse
+import atexit
+import fcntl
+import time
+import sys
+import select
+import subprocess
+import tty
+import termios
+import os
+import random
+import shutil
+import math
+import re
+import functools
+import unicodedata
+import signal
+import resource
+import queue
+import threading
+import socket
+import struct
+import json
+import mmap
+import heapq
+
+from pomotimer_client import (
+    debug_mode, debug_stats, Colors, COUNTING_PHASES, WAITING_PHASES, FINAL_PHASES,
+    STATUS_SEQ, STATUS_BODY, STATUS_SIZE, STATUS_VERSION, STATUS_PHASES, STATUS_KINDS,
+    status_path, ensure_private_dir, format_clock, format_duration, daemon_socket_path,
+    encode_message, daemon_connect, daemon_request, describe_timer, run_status_format,
+    run_client_command,
+)
+
+# Live per-cue player processes, oldest first; finished ones are reaped as they exit
+sound_processes = []
+children_exited = False
+
+def cleanup_sounds():
+    for p in sound_processes:
+        p.terminate()
+    audio_engine.close()
+
+def reap_sounds():
+    """Wait on finished players, so they don't linger as zombies, and drop them from the registry"""
+    global children_exited
+    children_exited = False
+    live = [p for p in sound_processes if p.poll() is None]
+    debug_stats['sound_processes_reaped'] = debug_stats.get('sound_processes_reaped', 0) + len(sound_processes) - len(live)
+    sound_processes[:] = live
+
+def register_sound_process(p):
+    reap_sounds()
+    sound_processes.append(p)
+    while len(sound_processes) > MAX_SOUND_PROCESSES:
+        oldest = sound_processes.pop(0)
+        oldest.kill()
+        oldest.wait()
+        debug_stats['sound_processes_killed'] = debug_stats.get('sound_processes_killed', 0) + 1
+    debug_stats['sound_processes_peak'] = max(debug_stats.get('sound_processes_peak', 0), len(sound_processes))
+
+def print_debug_summary():
+    if not debug_mode or not debug_stats:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    debug_stats['cpu_ms'] = round((usage.ru_utime + usage.ru_stime) * 1000, 1)
+    debug_stats['max_rss_kb'] = usage.ru_maxrss
+    sys.stderr.write("--- pomotimer debug summary ---\n")
+    for key, value in debug_stats.items():
+        sys.stderr.write(f"  {key}: {value}\n")
+    sys.stderr.flush()
+
+atexit.register(cleanup_sounds)
+atexit.register(print_debug_summary)
+
+# --- Clock ---
+# POMOTIMER_CLOCK=boottime (default) keeps counting while the laptop is suspended,
+# POMOTIMER_CLOCK=monotonic excludes suspended time from timers and overdue counters
+CLOCK_SOURCES = {
+    'boottime': getattr(time, 'CLOCK_BOOTTIME', time.CLOCK_MONOTONIC),
+    'monotonic': time.CLOCK_MONOTONIC,
+}
+clock_id = CLOCK_SOURCES.get(os.environ.get('POMOTIMER_CLOCK', 'boottime').lower(), CLOCK_SOURCES['boottime'])
+# Gaps larger than this between two wakeups are treated as a suspend/resume or a wall-clock step
+CLOCK_JUMP_THRESHOLD = 2.0
+
+class SystemClock:
+    """The clocks timers run on: the configured one for deadlines, the wall clock for jump checks"""
+
+    def now(self):
+        return time.clock_gettime(clock_id)
+
+    def wall(self):
+        return time.time()
+
+class VirtualClock:
+    """A clock that only moves when told to, so simulated runs take no real time"""
+
+    def __init__(self, start=0.0):
+        self.time = start
+
+    def now(self):
+        return self.time
+
+    def wall(self):
+        return self.time
+
+    def advance(self, seconds):
+        self.time += max(seconds, 0.0)
+
+clock = SystemClock()
+
+def clock_now():
+    return clock.now()
+
+class ClockWatch:
+    """Notices suspend/resume and wall-clock steps between two iterations of a timer loop"""
+
+    def __init__(self):
+        self.last_clock = clock_now()
+        self.last_wall = clock.wall()
+
+    def check(self, expected_wait=None):
+        """Return (now, jumped). expected_wait is how long the loop meant to sleep, None if unbounded"""
+        now = clock_now()
+        wall = clock.wall()
+        clock_delta = now - self.last_clock
+        wall_delta = wall - self.last_wall
+        self.last_clock = now
+        self.last_wall = wall
+
+        jumped = abs(wall_delta - clock_delta) > CLOCK_JUMP_THRESHOLD
+        if expected_wait is not None and clock_delta > expected_wait + CLOCK_JUMP_THRESHOLD:
+            jumped = True
+        if jumped:
+            debug_stats['clock_jumps'] = debug_stats.get('clock_jumps', 0) + 1
+        return now, jumped
+
+# --- UI & Style Constants ---
+def parse_time(time_str):
+    try:
+        time_str = time_str.strip()
+        if not time_str:
+            raise ValueError("Time string cannot be empty")
+            
+        if time_str.endswith('s'):
+            value = float(time_str[:-1])
+        elif time_str.endswith('m'):
+            value = float(time_str[:-1]) * 60
+        else:
+            # assume minutes if no suffix
+            value = float(time_str) * 60
+            
+        if value <= 0:
+            raise ValueError("Time value must be positive")
+            
+        return value
+    except (ValueError, IndexError) as e:
+        print(f"{Colors.RED}Error: Invalid time format '{time_str}'. Use format like '5m', '30s', or '25' (minutes).{Colors.ENDC}")
+        sys.exit(1)
+
+# --- Helper Capabilities ---
+# POMOTIMER_PLAYER overrides the mpg123 binary, e.g. with a fake player for testing
+PLAYER_COMMAND = os.environ.get('POMOTIMER_PLAYER', 'mpg123')
+HELPER_COMMANDS = {
+    'player': PLAYER_COMMAND,
+    'notify-send': 'notify-send',
+    'makoctl': 'makoctl',
+    'dunstify': 'dunstify',
+}
+CAPABILITIES_VERSION = 2
+capabilities = None
+capabilities_lock = threading.Lock()
+warnings_shown = set()
+
+def warn_once(message):
+    if message not in warnings_shown:
+        warnings_shown.add(message)
+        print(f"{Colors.YELLOW}{message}{Colors.ENDC}")
+
+def capabilities_cache_path():
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'pomotimer', 'capabilities.json')
+
+def capabilities_key(helpers):
+    """
+    PATH with the mtimes of its directories and of the resolved helpers. It changes
+    whenever a helper is installed, removed or upgraded, which invalidates the cache.
+    """
+    key = [os.environ.get('PATH', '')] + [f"{name}={command}" for name, command in sorted(HELPER_COMMANDS.items())]
+    for path in os.environ.get('PATH', '').split(os.pathsep) + [p for p in helpers.values() if p]:
+        try:
+            key.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            key.append(None)
+    return key
+
+def probe_capabilities():
+    """Resolve every helper and the optional features they support, running each at most once"""
+    helpers = {name: shutil.which(command) for name, command in HELPER_COMMANDS.items()}
+    features = {'notify_send_print_id': False, 'makoctl_dismiss_by_id': False}
+
+    def help_text(command):
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, timeout=NOTIFY_TIMEOUT)
+            return result.stdout + result.stderr
+        except (OSError, subprocess.TimeoutExpired):
+            return ''
+
+    if helpers['notify-send']:
+        # --print-id/--replace-id arrived in libnotify 0.7.10
+        features['notify_send_print_id'] = '--print-id' in help_text([helpers['notify-send'], '--help'])
+    if helpers['makoctl']:
+        # Only the usage line of dismiss counts, -n shows up in other options too
+        usage = help_text([helpers['makoctl'], 'help'])
+        features['makoctl_dismiss_by_id'] = re.search(r'^\s*dismiss\b.*[\s[]-n\b', usage, re.MULTILINE) is not None
+    return {'helpers': helpers, 'features': features}
+
+def load_capabilities():
+    try:
+        with open(capabilities_cache_path()) as f:
+            cached = json.load(f)
+        if cached.get('version') == CAPABILITIES_VERSION and cached['key'] == capabilities_key(cached['helpers']):
+            return {'helpers': cached['helpers'], 'features': cached['features']}
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+def save_capabilities(probed):
+    path = capabilities_cache_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': CAPABILITIES_VERSION, 'key': capabilities_key(probed['helpers']), **probed}, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # The in-memory copy still saves the exec attempts for this run
+
+def get_capabilities():
+    """
+    Helper paths and feature flags, resolved once: from the on-disk cache under
+    XDG_CACHE_HOME while PATH and the helpers are unchanged, otherwise probed.
+    """
+    global capabilities
+    with capabilities_lock:
+        if capabilities is None:
+            capabilities = load_capabilities()
+            debug_stats['capabilities'] = 'cached'
+            if capabilities is None:
+                capabilities = probe_capabilities()
+                save_capabilities(capabilities)
+                debug_stats['capabilities'] = 'probed'
+        return capabilities
+
+def helper_path(name):
+    return get_capabilities()['helpers'].get(name)
+
+def helper_feature(name):
+    return get_capabilities()['features'].get(name, False)
+
+# --- Audio ---
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def max_sounds_from_env(default=4):
+    value = os.environ.get('POMOTIMER_MAX_SOUNDS')
+    if not value:
+        return default
+    try:
+        return max(int(value), 1)
+    except ValueError:
+        warn_once(f"Warning: POMOTIMER_MAX_SOUNDS must be a whole number, not '{value}'. Using {default}")
+        return default
+
+# POMOTIMER_MAX_SOUNDS caps how many cues may play at once; the oldest is stopped beyond that
+MAX_SOUND_PROCESSES = max_sounds_from_env()
+
+@functools.lru_cache(maxsize=None)
+def resolve_sound(filename):
+    """Absolute path of a bundled sound and whether it exists, looked up once per file"""
+    filepath = os.path.join(SCRIPT_DIR, filename)
+    return filepath, os.path.isfile(filepath)
+
+def record_cue_latency(started, mode):
+    latency_ms = round((time.monotonic() - started) * 1000, 3)
+    debug_stats['audio_mode'] = mode
+    debug_stats['cue_latency_ms_last'] = latency_ms
+    debug_stats['cue_latency_ms_max'] = max(debug_stats.get('cue_latency_ms_max', latency_ms), latency_ms)
+
+class AudioEngine:
+    """
+    Plays cues through one long-lived player in remote-control mode (mpg123 -R), started
+    on first use, by sending it a LOAD command per cue instead of forking a new process.
+    LOAD replaces the track that is playing, so while the player is still busy with a cue
+    (it reports @P 0 once one ends) the next cue gets its own process and they overlap.
+    Falls back to a player process per cue when the remote player can't be started.
+    """
+
+    def __init__(self, command=None):
+        self.command = command
+        self.player = None
+        self.remote_failed = False
+        self.playing = False
+        self.status = b''
+
+    def resolve_command(self):
+        if self.command is None:
+            self.command = helper_path('player')
+        if self.command is None:
+            raise FileNotFoundError(PLAYER_COMMAND)
+        return self.command
+
+    def start_player(self):
+        try:
+            self.player = subprocess.Popen([self.command, '-R'],
+                                           stdin=subprocess.PIPE,
+                                           stdout=subprocess.PIPE,
+                                           stderr=subprocess.DEVNULL)
+        except (FileNotFoundError, OSError):
+            self.player = None
+            self.remote_failed = True
+            return
+        # Its status lines are read only when a cue comes, so never wait for them
+        os.set_blocking(self.player.stdout.fileno(), False)
+        self.playing = False
+        self.status = b''
+
+    def update_state(self):
+        """Catch up on the player's status lines, to know whether it is still playing"""
+        while True:
+            try:
+                data = os.read(self.player.stdout.fileno(), 65536)
+            except BlockingIOError:
+                break
+            except OSError:
+                data = b''
+            if not data:
+                break
+            lines = (self.status + data).split(b'\n')
+            self.status = lines.pop()
+            for line in lines:
+                if line.startswith(b'@P '):
+                    self.playing = line[3:4] != b'0'
+
+    def send(self, filepath):
+        """Hand a cue to the remote player; returns False if it isn't available or still busy"""
+        if self.remote_failed:
+            return False
+        # Restart the player once if it died in between
+        for _ in range(2):
+            if self.player is None or self.player.poll() is not None:
+                self.start_player()
+                if self.player is None:
+                    return False
+                started = True
+            else:
+                started = False
+            self.update_state()
+            if self.playing:
+                return False
+            try:
+                # SILENCE turns off the per-frame progress lines, leaving just the status changes
+                self.player.stdin.write((b"SILENCE\n" if started else b"") + f"LOAD {filepath}\n".encode())
+                self.player.stdin.flush()
+                self.playing = True
+                return True
+            except (BrokenPipeError, OSError):
+                self.close()
+        self.remote_failed = True
+        return False
+
+    def close(self):
+        if self.player is not None:
+            self.player.terminate()
+            self.player.wait()
+            self.player = None
+
+    def play(self, filepath):
+        started = time.monotonic()
+        self.resolve_command()
+        if self.send(filepath):
+            record_cue_latency(started, 'remote')
+            return
+        p = subprocess.Popen([self.command, '-q', filepath],
+                             stdout=subprocess.DEVNULL,
+                             stderr=subprocess.DEVNULL)
+        register_sound_process(p)
+        record_cue_latency(started, 'spawn')
+
+audio_engine = AudioEngine()
+MISSING_PLAYER_WARNING = "Warning: mpg123 not found. Install with: sudo pacman -S mpg123"
+
+def play_sound(filename):
+    filepath, found = resolve_sound(filename)
+    if not found:
+        print(f"{Colors.YELLOW}Warning: Sound file not found: {filepath}{Colors.ENDC}")
+        return
+
+    try:
+        audio_engine.play(filepath)
+    except FileNotFoundError:
+        warn_once(MISSING_PLAYER_WARNING)
+    except Exception as e:
+        print(f"{Colors.YELLOW}Warning: Failed to play sound {filepath}: {e}{Colors.ENDC}")
+
+def play_detached_sound(filename):
+    # Spawned on its own, as it has to outlive this process and its player
+    filepath, found = resolve_sound(filename)
+    player = helper_path('player')
+    if not found or player is None:
+        return  # Silently skip missing files or player in detached mode
+
+    try:
+        subprocess.Popen([player, '-q', filepath],
+                        stdin=subprocess.DEVNULL,
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL,
+                        start_new_session=True)
+    except (FileNotFoundError, Exception):
+        pass  # Silently fail in detached mode
+
+# --- D-Bus ---
+DBUS_NOTIFICATIONS = ('org.freedesktop.Notifications', '/org/freedesktop/Notifications', 'org.freedesktop.Notifications')
+DBUS_ALIGNMENT = {'y': 1, 'b': 4, 'n': 2, 'q': 2, 'i': 4, 'u': 4, 'x': 8, 't': 8, 'd': 8, 'h': 4,
+                  's': 4, 'o': 4, 'g': 1, 'v': 1, 'a': 4, '(': 8, '{': 8}
+DBUS_FIXED = {'y': 'B', 'b': 'I', 'n': 'h', 'q': 'H', 'i': 'i', 'u': 'I', 'x': 'q', 't': 'Q', 'd': 'd', 'h': 'I'}
+DBUS_METHOD_CALL, DBUS_METHOD_RETURN, DBUS_ERROR = 1, 2, 3
+DBUS_HEADER_FIELDS = {1: 'path', 2: 'interface', 3: 'member', 4: 'error_name', 5: 'reply_serial',
+                      6: 'destination', 7: 'sender', 8: 'signature'}
+
+class DBusError(Exception):
+    def __init__(self, name, message=''):
+        super().__init__(f"{name}: {message}" if message else name)
+        self.name = name
+
+def dbus_split_signature(signature):
+    """Split a signature into complete types: 'sa{sv}i' -> ['s', 'a{sv}', 'i']"""
+    types = []
+    i = 0
+    while i < len(signature):
+        end = dbus_type_end(signature, i)
+        types.append(signature[i:end])
+        i = end
+    return types
+
+def dbus_type_end(signature, i):
+    char = signature[i]
+    if char == 'a':
+        return dbus_type_end(signature, i + 1)
+    if char in '({':
+        close = ')' if char == '(' else '}'
+        i += 1
+        while signature[i] != close:
+            i = dbus_type_end(signature, i)
+    return i + 1
+
+class DBusWriter:
+    """Marshals values into the little-endian D-Bus wire format. Variants are (signature, value) pairs"""
+
+    def __init__(self):
+        self.buf = bytearray()
+
+    def align(self, n):
+        self.buf += b'\0' * (-len(self.buf) % n)
+
+    def write(self, sigtype, value):
+        char = sigtype[0]
+        if char in DBUS_FIXED:
+            self.align(DBUS_ALIGNMENT[char])
+            self.buf += struct.pack('<' + DBUS_FIXED[char], value)
+        elif char in 'so':
+            data = value.encode()
+            self.align(4)
+            self.buf += struct.pack('<I', len(data)) + data + b'\0'
+        elif char == 'g':
+            data = value.encode()
+            self.buf += bytes([len(data)]) + data + b'\0'
+        elif char == 'v':
+            signature, inner = value
+            self.write('g', signature)
+            self.write(signature, inner)
+        elif char == 'a':
+            element = sigtype[1:]
+            self.align(4)
+            length_at = len(self.buf)
+            self.buf += b'\0\0\0\0'
+            self.align(DBUS_ALIGNMENT[element[0]])
+            start = len(self.buf)
+            for item in (value.items() if element[0] == '{' else value):
+                self.write(element, item)
+            struct.pack_into('<I', self.buf, length_at, len(self.buf) - start)
+        elif char in '({':
+            self.align(8)
+            for member, item in zip(dbus_split_signature(sigtype[1:-1]), value):
+                self.write(member, item)
+        else:
+            raise ValueError(f"Unsupported D-Bus type '{sigtype}'")
+
+class DBusReader:
+    """Unmarshals values from a D-Bus message in either byte order. Variants are unwrapped"""
+
+    def __init__(self, data, pos, endian):
+        self.data = data
+        self.pos = pos
+        self.endian = endian
+
+    def align(self, n):
+        self.pos += -self.pos % n
+
+    def read(self, sigtype):
+        char = sigtype[0]
+        if char in DBUS_FIXED:
+            self.align(DBUS_ALIGNMENT[char])
+            fmt = self.endian + DBUS_FIXED[char]
+            value = struct.unpack_from(fmt, self.data, self.pos)[0]
+            self.pos += struct.calcsize(fmt)
+            return bool(value) if char == 'b' else value
+        if char in 'sog':
+            if char == 'g':
+                length = self.data[self.pos]
+                self.pos += 1
+            else:
+                length = self.read('u')
+            value = bytes(self.data[self.pos:self.pos + length]).decode()
+            self.pos += length + 1
+            return value
+        if char == 'v':
+            return self.read(self.read('g'))
+        if char == 'a':
+            element = sigtype[1:]
+            end = self.read('u')
+            self.align(DBUS_ALIGNMENT[element[0]])
+            end += self.pos
+            items = []
+            while self.pos < end:
+                items.append(self.read(element))
+            return dict(items) if element[0] == '{' else items
+        if char in '({':
+            self.align(8)
+            return tuple(self.read(member) for member in dbus_split_signature(sigtype[1:-1]))
+        raise ValueError(f"Unsupported D-Bus type '{sigtype}'")
+
+def session_bus_address():
+    """Socket address of the session bus as (family_path, is_abstract), or None if there is none"""
+    address = os.environ.get('DBUS_SESSION_BUS_ADDRESS')
+    if not address:
+        runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+        path = os.path.join(runtime_dir, 'bus') if runtime_dir else None
+        return (path, False) if path and os.path.exists(path) else None
+    for entry in address.split(';'):
+        transport, _, params = entry.partition(':')
+        if transport != 'unix':
+            continue
+        options = dict(option.partition('=')[::2] for option in params.split(','))
+        unescape = lambda value: re.sub(r'%([0-9A-Fa-f]{2})', lambda m: chr(int(m.group(1), 16)), value)
+        if 'path' in options:
+            return unescape(options['path']), False
+        if 'abstract' in options:
+            return unescape(options['abstract']), True
+    return None
+
+class DBusConnection:
+    """
+    Minimal D-Bus client speaking the wire protocol over the session bus socket, enough
+    to call org.freedesktop.Notifications without extra dependencies or a notify-send
+    process per call. Not thread-safe: one thread owns the connection.
+    """
+
+    def __init__(self, address=None, timeout=5):
+        self.address = address or session_bus_address()
+        self.timeout = timeout
+        self.sock = None
+        self.buffer = bytearray()
+        self.serial = 0
+        self.unique_name = None
+
+    def connect(self):
+        if self.address is None:
+            raise OSError("No D-Bus session bus")
+        path, abstract = self.address
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        try:
+            self.sock.connect('\0' + path if abstract else path)
+            # SASL handshake: authenticate as our own uid, then switch to the binary protocol
+            uid = str(os.getuid()).encode().hex()
+            self.sock.sendall(f"\0AUTH EXTERNAL {uid}\r\n".encode())
+            reply = self.read_line()
+            if not reply.startswith(b'OK'):
+                raise OSError(f"D-Bus authentication failed: {reply!r}")
+            self.sock.sendall(b'BEGIN\r\n')
+            (self.unique_name,) = self.call('org.freedesktop.DBus', '/org/freedesktop/DBus', 'org.freedesktop.DBus', 'Hello')
+        except Exception:
+            self.close()
+            raise
+        return self
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def read_line(self):
+        while b'\r\n' not in self.buffer:
+            self.receive()
+        line, _, rest = bytes(self.buffer).partition(b'\r\n')
+        self.buffer = bytearray(rest)
+        return line
+
+    def receive(self):
+        data = self.sock.recv(65536)
+        if not data:
+            raise ConnectionResetError("D-Bus connection closed")
+        self.buffer += data
+
+    def build_message(self, destination, path, interface, member, signature='', args=()):
+        """Marshal a method call with the next serial; returns (serial, bytes)"""
+        self.serial += 1
+        body = DBusWriter()
+        for sigtype, value in zip(dbus_split_signature(signature), args):
+            body.write(sigtype, value)
+        fields = [(1, ('o', path)), (3, ('s', member))]
+        if interface:
+            fields.append((2, ('s', interface)))
+        if destination:
+            fields.append((6, ('s', destination)))
+        if signature:
+            fields.append((8, ('g', signature)))
+        header = DBusWriter()
+        header.buf += bytes([ord('l'), DBUS_METHOD_CALL, 0, 1])
+        header.buf += struct.pack('<II', len(body.buf), self.serial)
+        header.write('a(yv)', fields)
+        header.align(8)
+        return self.serial, bytes(header.buf + body.buf)
+
+    def send(self, destination, path, interface, member, signature='', args=()):
+        """Write a method call to the socket; returns its serial for wait_reply()"""
+        serial, message = self.build_message(destination, path, interface, member, signature, args)
+        self.sock.sendall(message)
+        return serial
+
+    def read_message(self):
+        """Next complete message as (type, header fields, body values)"""
+        while len(self.buffer) < 16:
+            self.receive()
+        endian = '<' if self.buffer[0] == ord('l') else '>'
+        msg_type = self.buffer[1]
+        body_length, _, fields_length = struct.unpack_from(endian + 'III', self.buffer, 4)
+        header_length = 16 + fields_length + (-(16 + fields_length) % 8)
+        total = header_length + body_length
+        while len(self.buffer) < total:
+            self.receive()
+        message = bytes(self.buffer[:total])
+        del self.buffer[:total]
+        fields = {DBUS_HEADER_FIELDS.get(code, code): value
+                  for code, value in DBusReader(message, 12, endian).read('a(yv)')}
+        reader = DBusReader(message, header_length, endian)
+        body = [reader.read(sigtype) for sigtype in dbus_split_signature(fields.get('signature', ''))]
+        return msg_type, fields, body
+
+    def wait_reply(self, serial):
+        """Body of the reply to serial; signals and unrelated messages are skipped"""
+        while True:
+            msg_type, fields, body = self.read_message()
+            if fields.get('reply_serial') != serial:
+                continue
+            if msg_type == DBUS_ERROR:
+                raise DBusError(fields.get('error_name', 'org.freedesktop.DBus.Error.Failed'), body[0] if body else '')
+            if msg_type == DBUS_METHOD_RETURN:
+                return body
+
+    def call(self, destination, path, interface, member, signature='', args=()):
+        return self.wait_reply(self.send(destination, path, interface, member, signature, args))
+
+    def call_many(self, destination, path, interface, member, signature, arg_lists):
+        """
+        Pipeline several calls of one method: all of them go out in a single write, then
+        the replies are collected in any order. Returns a body or a DBusError per call.
+        """
+        pending = {}
+        messages = []
+        for index, args in enumerate(arg_lists):
+            serial, message = self.build_message(destination, path, interface, member, signature, args)
+            pending[serial] = index
+            messages.append(message)
+        self.sock.sendall(b''.join(messages))
+        results = [None] * len(messages)
+        while pending:
+            msg_type, fields, body = self.read_message()
+            index = pending.pop(fields.get('reply_serial'), None)
+            if index is None or msg_type not in (DBUS_METHOD_RETURN, DBUS_ERROR):
+                continue
+            if msg_type == DBUS_ERROR:
+                body = DBusError(fields.get('error_name', 'org.freedesktop.DBus.Error.Failed'), body[0] if body else '')
+            results[index] = body
+        return results
+
+# --- Notifications ---
+NOTIFY_QUEUE_SIZE = 16
+# Seconds a single notify-send/makoctl call may take before it's abandoned
+NOTIFY_TIMEOUT = 5
+
+def count_stat(key, amount=1):
+    debug_stats[key] = debug_stats.get(key, 0) + amount
+
+class NotificationDispatcher:
+    """
+    Runs notification jobs on a background thread, so a slow notification daemon or a
+    busy D-Bus never stalls the timer loop. Jobs go through a bounded queue; a job that
+    is identical to one still waiting is coalesced, and jobs that don't fit are dropped.
+    """
+
+    def __init__(self, size=NOTIFY_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize=size)
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.thread = None
+        # Set by the worker, printed by the main thread with the next notification
+        self.warning = None
+
+    def submit(self, func, *args):
+        """Queue func(*args) without ever blocking; returns False if it was coalesced or dropped"""
+        job = (func, args)
+        with self.lock:
+            if job in self.pending:
+                count_stat('notifications_coalesced')
+                return False
+            try:
+                self.queue.put_nowait(job)
+            except queue.Full:
+                count_stat('notifications_dropped')
+                return False
+            self.pending.add(job)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='pomotimer-notify', daemon=True)
+                self.thread.start()
+        return True
+
+    def run(self):
+        while True:
+            job = self.queue.get()
+            with self.lock:
+                self.pending.discard(job)
+            func, args = job
+            try:
+                func(*args)
+            except subprocess.TimeoutExpired:
+                count_stat('notifications_timed_out')
+            except Exception as e:
+                self.warning = f"Note: Failed to send notification: {e}"
+            finally:
+                self.queue.task_done()
+
+    def flush(self, timeout=NOTIFY_TIMEOUT):
+        """Give queued jobs up to timeout seconds to finish, e.g. before exiting"""
+        deadline = time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.queue.all_tasks_done.wait(remaining)
+
+notifications = NotificationDispatcher()
+atexit.register(notifications.flush)
+
+URGENCY_LEVELS = {'low': 0, 'normal': 1, 'critical': 2}
+# Slot for the timer-complete/overdue notification, which is updated in place.
+# Daemon timers each use their own, suffixed with the timer name (see timer_slot)
+OVERDUE_SLOT = 'overdue'
+notification_bus = None
+notification_bus_failed = False
+# Notification IDs by slot, and the IDs still to be dismissed by owner, i.e. the daemon
+# timer name or None for the process's own run (worker thread only)
+notification_slots = {}
+tracked_notification_ids = {}
+# POMOTIMER_NOTIFY_BACKEND picks how tracked notifications are closed: dbus, mako, dunst or swaync
+NOTIFY_BACKEND = os.environ.get('POMOTIMER_NOTIFY_BACKEND', 'auto').lower()
+
+def get_notification_bus():
+    """The worker's session bus connection, opened once and kept for the life of the process"""
+    global notification_bus, notification_bus_failed
+    if notification_bus is None and not notification_bus_failed:
+        try:
+            notification_bus = DBusConnection(timeout=NOTIFY_TIMEOUT).connect()
+        except (OSError, DBusError, ValueError):
+            notification_bus_failed = True
+    return notification_bus
+
+def bus_notify(message, urgency=None, expire_time=None, replaces_id=0):
+    """Send Notify straight over D-Bus; returns the notification ID, or None if D-Bus isn't usable"""
+    global notification_bus, notification_bus_failed
+    # One reconnect if the bus went away, e.g. after the notification daemon restarted
+    for _ in range(2):
+        bus = get_notification_bus()
+        if bus is None:
+            return None
+        hints = {'urgency': ('y', URGENCY_LEVELS[urgency])} if urgency else {}
+        args = ['pomotimer', replaces_id, '', message, '', [], hints, -1 if expire_time is None else expire_time]
+        try:
+            (notification_id,) = bus.call(*DBUS_NOTIFICATIONS, 'Notify', 'susssasa{sv}i', args)
+            return notification_id
+        except DBusError:
+            # Nobody owns org.freedesktop.Notifications; stop trying and let notify-send report it
+            bus.close()
+            notification_bus = None
+            notification_bus_failed = True
+            return None
+        except (OSError, ValueError):
+            bus.close()
+            notification_bus = None
+    notification_bus_failed = True
+    return None
+
+def notify_send(message, urgency=None, expire_time=None, warn=False, replaces_id=0):
+    """
+    Fallback through the notify-send binary. The ID is requested back, so the
+    notification can be updated and dismissed later; returns it if known.
+    """
+    notify_send_path = helper_path('notify-send')
+    if notify_send_path is None:
+        return None
+    command = [notify_send_path, '--app-name=pomotimer']
+    if urgency:
+        command.append(f'--urgency={urgency}')
+    if expire_time is not None:
+        command.append(f'--expire-time={expire_time}')
+    use_ids = helper_feature('notify_send_print_id')
+    if use_ids:
+        command.append('--print-id')
+        if replaces_id:
+            command.append(f'--replace-id={replaces_id}')
+    command.append(message)
+    result = subprocess.run(command, capture_output=True, text=True, timeout=NOTIFY_TIMEOUT)
+    if result.returncode != 0 and warn:
+        notifications.warning = "Note: Desktop notifications may not be available"
+    try:
+        return int(result.stdout.split()[0]) if use_ids else None
+    except (IndexError, ValueError):
+        return None
+
+def timer_slot(name):
+    """The overdue slot of a daemon timer, so timers don't replace each other's notification"""
+    return f"{OVERDUE_SLOT}:{name}"
+
+def send_notification(message, urgency=None, expire_time=None, warn=False, slot=None, owner=None):
+    """Show a notification; one with a slot replaces the previous notification in that slot"""
+    replaces_id = notification_slots.get(slot, 0) if slot else 0
+    notification_id = bus_notify(message, urgency, expire_time, replaces_id)
+    if notification_id is None:
+        notification_id = notify_send(message, urgency, expire_time, warn, replaces_id)
+    count_stat('notifications_sent')
+    if notification_id:
+        tracked_notification_ids.setdefault(owner, set()).add(notification_id)
+        if slot:
+            notification_slots[slot] = notification_id
+
+MISSING_NOTIFY_SEND_NOTE = "Note: notify-send not found. Desktop notifications disabled"
+
+def notify(message, urgency=None, expire_time=3000, warn=True, slot=None, owner=None):
+    """
+    Queue a desktop notification. Critical ones are sent without expire-time, so they
+    last until dismissed. A notification with a slot updates the previous one in that
+    slot in place. owner names the daemon timer it belongs to, for dismissal. Problems
+    are reported with the following notification.
+    """
+    if notifications.warning and warn:
+        print(f"{Colors.YELLOW}{notifications.warning}{Colors.ENDC}")
+        notifications.warning = None
+    if session_bus_address() is None and helper_path('notify-send') is None:
+        if warn:
+            warn_once(MISSING_NOTIFY_SEND_NOTE)
+        return
+    notifications.submit(send_notification, message, urgency, expire_time, warn, slot, owner)
+
+def report_missing_helpers():
+    """
+    Probe the helpers and warn about missing ones before a terminal timer draws its first
+    frame. Once shown here, play_sound() and notify() don't print them over the status line.
+    """
+    if helper_path('player') is None:
+        warn_once(MISSING_PLAYER_WARNING)
+    if session_bus_address() is None and helper_path('notify-send') is None:
+        warn_once(MISSING_NOTIFY_SEND_NOTE)
+
+def close_with_dbus(ids):
+    """Generic CloseNotification, pipelined over the session bus in one write"""
+    global notification_bus
+    bus = get_notification_bus()
+    if bus is None:
+        return False
+    try:
+        # Errors only mean a notification already expired or was closed by the user
+        bus.call_many(*DBUS_NOTIFICATIONS, 'CloseNotification', 'u', [[i] for i in ids])
+        return True
+    except (OSError, ValueError):
+        bus.close()
+        notification_bus = None
+        return False
+
+def close_with_commands(command, ids):
+    """Run one close command per ID, all started at once and then waited for together"""
+    if command[0] is None:
+        return False
+    try:
+        processes = [subprocess.Popen(command + [str(i)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                     for i in ids]
+    except FileNotFoundError:
+        return False
+    for p in processes:
+        try:
+            p.wait(timeout=NOTIFY_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            p.kill()
+            p.wait()
+    return True
+
+# How to close a batch of notification IDs, per notification daemon. dunst and swaync
+# close by ID best through the standard CloseNotification call they both implement.
+NOTIFICATION_BACKENDS = {
+    'dbus': close_with_dbus,
+    'mako': lambda ids: close_with_dbus(ids) or (helper_feature('makoctl_dismiss_by_id') and
+                                                 close_with_commands([helper_path('makoctl'), 'dismiss', '-n'], ids)),
+    'dunst': lambda ids: close_with_dbus(ids) or close_with_commands([helper_path('dunstify'), '-C'], ids),
+    'swaync': close_with_dbus,
+}
+
+def notification_backend():
+    if NOTIFY_BACKEND in NOTIFICATION_BACKENDS:
+        return NOTIFICATION_BACKENDS[NOTIFY_BACKEND]
+    if get_notification_bus() is not None:
+        return close_with_dbus
+    if helper_path('makoctl'):
+        return NOTIFICATION_BACKENDS['mako']
+    if helper_path('dunstify'):
+        return NOTIFICATION_BACKENDS['dunst']
+    return None
+
+def dismiss_timer_notifications(owner=None):
+    """
+    Dismiss all notifications from the pomotimer app only, or with an owner, only those
+    of that daemon timer. Closes the IDs recorded when they were sent in one batch;
+    listing mako's notifications is only the fallback for when no IDs are known, and
+    only without an owner, since it can't tell timers apart.
+    """
+    if owner is None:
+        ids = sorted(set().union(*tracked_notification_ids.values()))
+        tracked_notification_ids.clear()
+        notification_slots.clear()
+    else:
+        ids = sorted(tracked_notification_ids.pop(owner, ()))
+        for slot in [slot for slot, notification_id in notification_slots.items() if notification_id in ids]:
+            del notification_slots[slot]
+    backend = notification_backend()
+    if ids and backend is not None and backend(ids):
+        count_stat('notifications_dismissed', len(ids))
+        return
+    if owner is None:
+        dismiss_listed_notifications()
+
+def dismiss_listed_notifications():
+    """
+    Uses makoctl to list notifications and dismiss only those with app-name=pomotimer.
+    """
+    makoctl = helper_path('makoctl')
+    if makoctl is None:
+        return
+    try:
+        # Get list of current notifications
+        result = subprocess.run([makoctl, 'list'], capture_output=True, text=True, timeout=NOTIFY_TIMEOUT)
+        if result.returncode != 0:
+            return
+        
+        # Parse the output to find pomotimer notification IDs
+        lines = result.stdout.strip().split('\n')
+        pomotimer_ids = []
+        
+        for i, line in enumerate(lines):
+            if line.startswith('Notification ') and i + 1 < len(lines):
+                if 'App name: pomotimer' in lines[i + 1]:
+                    # Extract notification ID from "Notification 123: ..."
+                    notification_id = line.split()[1].rstrip(':')
+                    pomotimer_ids.append(notification_id)
+        
+        # Dismiss each pomotimer notification
+        for notification_id in pomotimer_ids:
+            subprocess.run([makoctl, 'dismiss', '-n', notification_id],
+                         capture_output=True, text=True, timeout=NOTIFY_TIMEOUT)
+                         
+    except (FileNotFoundError, Exception):
+        pass  # Silently fail if makoctl not available or other errors occur
+
+def get_work_complete_sound():
+    if random.random() < 0.2:  # 20% chance
+        return 'media/are-you-winning-son.mp3'
+    else:
+        return 'media/break-time.mp3'
+
+# --- Text Width ---
+# Any CSI sequence (colors, cursor movement); matched as a whole so it never counts as visible
+ANSI_TOKEN = re.compile(r'\x1b\[[0-9;?]*[ -/]*[@-~]')
+BAR_GLYPH = '▌'
+
+@functools.lru_cache(maxsize=4096)
+def char_width(char):
+    """
+    Terminal cells taken by a single character, wcwidth style: combining marks, format
+    and control characters take none, East Asian wide/fullwidth glyphs (CJK, most emoji) two.
+    """
+    if char < ' ' or '\x7f' <= char < '\xa0':
+        return 0
+    if unicodedata.combining(char) or unicodedata.category(char) in ('Mn', 'Me', 'Cf'):
+        return 0
+    return 2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1
+
+def plain_width(text):
+    """Visible width of text without escape sequences"""
+    if text.isascii() and text.isprintable():
+        return len(text)
+    return sum(map(char_width, text))
+
+def slice_to_width(text, max_width):
+    """Longest prefix of plain text that fits in max_width cells"""
+    if text.isascii() and text.isprintable():
+        return text[:max_width]
+    used = 0
+    for i, char in enumerate(text):
+        used += char_width(char)
+        if used > max_width:
+            return text[:i]
+    return text
+
+@functools.lru_cache(maxsize=256)
+def get_visual_length(text):
+    """
+    Visible width of a string in terminal cells, ignoring ANSI escape sequences.
+    Cached, as frames are measured from the same static message fragments every tick.
+    """
+    return plain_width(ANSI_TOKEN.sub('', text))
+
+def truncate_visual(text, max_width, ellipsis='...'):
+    """
+    Cut text to at most max_width visible columns, ending with the ellipsis.
+
+    Escape sequences are tokenized once and copied through untouched, so they never
+    count towards the width. Returns the text unchanged when it already fits.
+    """
+    limit = max(max_width - len(ellipsis), 0)
+    pieces = []
+    visible = 0
+    pos = 0
+    cut = None
+    for match in ANSI_TOKEN.finditer(text):
+        segment_width = plain_width(text[pos:match.start()])
+        if cut is None and visible + segment_width > limit:
+            # Remember where the text has to be cut, but keep measuring in case it fits after all
+            cut = (len(pieces), pos, visible)
+        visible += segment_width
+        if cut is None:
+            pieces.append(text[pos:match.start()])
+            pieces.append(match.group())
+        elif visible > max_width:
+            break
+        pos = match.end()
+    else:
+        # No escape sequence left: the rest is plain text
+        if visible + plain_width(text[pos:]) <= max_width:
+            return text
+        if cut is None:
+            cut = (len(pieces), pos, visible)
+
+    count, pos, visible = cut
+    end = text.find('\x1b', pos)
+    if end == -1:
+        end = len(text)
+    pieces.append(slice_to_width(text[pos:end], limit - visible))
+    if count:
+        pieces.append(Colors.ENDC)
+    pieces.append(ellipsis[:max(max_width, 0)])
+    return ''.join(pieces)
+
+# --- Rendering ---
+# DEC private mode 2026: the terminal holds output between begin and end and shows it at once
+SYNC_UPDATE_BEGIN = '\x1b[?2026h'
+SYNC_UPDATE_END = '\x1b[?2026l'
+SYNC_UPDATE_REPLY = re.compile(rb'\x1b\[\?2026;(\d)\$y')
+sync_update_supported = None
+
+def probe_sync_update(timeout=0.1):
+    """
+    Ask the terminal once (DECRQM) whether it supports synchronized updates and cache the
+    answer. Must be called in raw mode, before anything reads stdin.
+    """
+    global sync_update_supported
+    if sync_update_supported is not None:
+        return sync_update_supported
+    sync_update_supported = False
+    try:
+        sys.stdout.flush()
+        os.write(sys.stdout.fileno(), b'\x1b[?2026$p')
+        reply = b''
+        deadline = time.monotonic() + timeout
+        while not reply.endswith(b'$y'):
+            wait = deadline - time.monotonic()
+            if wait <= 0 or not select.select([sys.stdin], [], [], wait)[0]:
+                break
+            reply += os.read(sys.stdin.fileno(), 64)
+        match = SYNC_UPDATE_REPLY.search(reply)
+        # 1 = set, 2 = reset: the mode is known. 0 = unknown, 4 = permanently off
+        sync_update_supported = bool(match) and match.group(1) in (b'1', b'2')
+    except OSError:
+        pass
+    debug_stats['sync_update'] = sync_update_supported
+    return sync_update_supported
+
+def write_frame(frame):
+    """Write a whole frame to the terminal with a single write, synchronized if supported"""
+    if sync_update_supported:
+        frame = SYNC_UPDATE_BEGIN + frame + SYNC_UPDATE_END
+    event_loop.write(frame)
+
+# Unchanged cells between two changed runs that are cheaper to rewrite than to skip
+RUN_MERGE_GAP = 6
+
+class Renderer:
+    """
+    Draws the status line at the saved cursor position (\x1b[s) with damage tracking.
+
+    The previous frame is kept as a row of (style, glyph) cells and each new frame only
+    writes the cells that changed, so a steady tick costs a handful of bytes instead of
+    a full redraw. The right half of a wide glyph is stored as an empty cell.
+    """
+
+    def __init__(self):
+        self.cells = None
+        self.pen = ''
+        self.frames = 0
+        self.bytes_written = 0
+
+    def invalidate(self):
+        """Forget the previous frame, so the next one is drawn in full"""
+        self.cells = None
+
+    @staticmethod
+    def parse(frame):
+        """Split a frame into cells, returning (cells, style active at the end)"""
+        cells = []
+        style = ''
+        pos = 0
+        for match in ANSI_TOKEN.finditer(frame + '\x1b[m'):
+            for char in frame[pos:match.start()]:
+                width = char_width(char)
+                if width == 0:
+                    if cells:
+                        cells[-1] = (cells[-1][0], cells[-1][1] + char)
+                    continue
+                cells.append((style, char))
+                if width == 2:
+                    cells.append((style, ''))
+            sequence = match.group()
+            if sequence.endswith('m') and match.end() <= len(frame):
+                style = '' if sequence in (Colors.ENDC, '\x1b[m') else style + sequence
+            pos = match.end()
+        return cells, style
+
+    def render(self, frame):
+        """Return the bytes that turn the previous frame into this one"""
+        cells, end_style = self.parse(frame)
+        old = self.cells
+        self.cells = cells
+        if old is None:
+            self.pen = end_style
+            return '\x1b[u\x1b[J' + frame
+
+        out = []
+        pen = self.pen
+        cursor = None
+        common = min(len(cells), len(old))
+        i = 0
+        while i < len(cells):
+            if i < common and cells[i] == old[i]:
+                i += 1
+                continue
+            start = i
+            while True:
+                while i < len(cells) and (i >= common or cells[i] != old[i]):
+                    i += 1
+                # Rewriting a few unchanged cells is cheaper than another cursor move
+                gap = i
+                while gap < common and gap - i < RUN_MERGE_GAP and cells[gap] == old[gap]:
+                    gap += 1
+                if gap == i or gap >= len(cells) or gap - i >= RUN_MERGE_GAP:
+                    break
+                i = gap
+            # Never start or stop in the middle of a wide glyph
+            while start > 0 and (cells[start][1] == '' or (start < len(old) and old[start][1] == '')):
+                start -= 1
+            while i < common and (cells[i][1] == '' or old[i][1] == ''):
+                i += 1
+            if cursor != start:
+                out.append('\x1b[u' + (f'\x1b[{start}C' if start else ''))
+            for style, glyph in cells[start:i]:
+                if not glyph:
+                    continue
+                if style != pen:
+                    out.append(Colors.ENDC + style)
+                    pen = style
+                out.append(glyph)
+            cursor = i
+        if len(old) > len(cells):
+            if cursor != len(cells):
+                out.append('\x1b[u' + (f'\x1b[{len(cells)}C' if cells else ''))
+            out.append('\x1b[K')
+        self.pen = pen
+        return ''.join(out)
+
+    def draw(self, frame):
+        output = self.render(frame)
+        if output:
+            write_frame(output)
+        self.frames += 1
+        self.bytes_written += len(output.encode())
+        debug_stats['render_frames'] = self.frames
+        debug_stats['render_bytes_last'] = len(output.encode())
+        debug_stats['render_bytes_avg'] = round(self.bytes_written / self.frames, 1)
+
+    def finish(self):
+        """Reset the terminal pen after the last frame, so following output isn't styled"""
+        if self.pen:
+            sys.stdout.write(Colors.ENDC)
+            sys.stdout.flush()
+        self.pen = ''
+        self.invalidate()
+
+status_renderer = Renderer()
+
+# --- Layout ---
+MIN_BAR_WIDTH = 5
+MAX_BAR_WIDTH = 40
+
+class Layout:
+    """
+    Numbers that depend on the terminal size: the column and row counts, the progress bar
+    width and how many lines wrapped content takes. They are recomputed only after SIGWINCH
+    reports a resize, so a steady tick does no ioctl or environment lookups.
+    """
+
+    def __init__(self):
+        self.resized = True
+        self.columns = 80
+        self.rows = 24
+        self.bar_widths = {}
+        self.wrap_lines = {}
+
+    def refresh(self):
+        """Pick up a pending resize; returns True if the size was (re)read"""
+        if not self.resized:
+            return False
+        self.resized = False
+        size = shutil.get_terminal_size()
+        self.columns = max(size.columns, 1)
+        self.rows = max(size.lines, 1)
+        self.bar_widths.clear()
+        self.wrap_lines.clear()
+        return True
+
+    def bar_width(self, other_width):
+        """Progress bar cells that fit next to other_width cells of text, a quarter of the line at most"""
+        width = self.bar_widths.get(other_width)
+        if width is None:
+            width = min(self.columns // 4, self.columns - other_width, MAX_BAR_WIDTH)
+            width = self.bar_widths[other_width] = max(width, MIN_BAR_WIDTH)
+        return width
+
+    def lines_needed(self, content_width):
+        """Terminal lines taken by content_width cells once it wraps"""
+        lines = self.wrap_lines.get(content_width)
+        if lines is None:
+            lines = self.wrap_lines[content_width] = max((content_width + self.columns - 1) // self.columns, 1)
+        return lines
+
+layout = Layout()
+signal_wakeup_fd = None
+
+def handle_resize(signum, frame):
+    layout.resized = True
+
+def handle_child_exit(signum, frame):
+    global children_exited
+    children_exited = True
+
+def watch_signals():
+    """
+    Route SIGWINCH into the layout and SIGCHLD into the sound reaper, and make signals
+    wake up the event loop through a self-pipe, so a resize is redrawn and a finished
+    player reaped right away even while the loop waits for a key.
+    """
+    global signal_wakeup_fd
+    if signal_wakeup_fd is not None:
+        return
+    read_fd, write_fd = os.pipe()
+    os.set_blocking(read_fd, False)
+    os.set_blocking(write_fd, False)
+    try:
+        signal.set_wakeup_fd(write_fd)
+    except ValueError:
+        # Not in the main thread; resizes are then picked up on the next tick
+        os.close(read_fd)
+        os.close(write_fd)
+        return
+    if hasattr(signal, 'SIGWINCH'):
+        signal.signal(signal.SIGWINCH, handle_resize)
+    signal.signal(signal.SIGCHLD, handle_child_exit)
+    signal_wakeup_fd = read_fd
+
+# --- Event Loop ---
+class EventLoop:
+    """
+    One select() loop for a whole run. It waits on stdin, registered sockets and the
+    signal self-pipe at once, and drives a screen coroutine: a generator that yields
+    how long it may wait (None for no limit) and is sent the key that arrived, or None.
+    Screens chain with `yield from`, so raw mode is entered once per run rather than
+    once per screen. Side effects queued with call_soon() run after the screen yields,
+    i.e. once its frame is on the terminal.
+    """
+
+    def __init__(self):
+        self.readers = {}
+        self.pending = []
+        self.interactive = False
+        self.old_settings = None
+
+    def add_reader(self, sock, callback):
+        self.readers[sock] = callback
+
+    def remove_reader(self, sock):
+        self.readers.pop(sock, None)
+
+    def call_soon(self, func, *args):
+        self.pending.append((func, args))
+
+    def write(self, frame):
+        data = frame.encode()
+        # Anything print() left in the buffer must come first
+        sys.stdout.flush()
+        fd = sys.stdout.fileno()
+        while data:
+            data = data[os.write(fd, data):]
+
+    def run_pending(self):
+        while self.pending:
+            func, args = self.pending.pop(0)
+            func(*args)
+
+    def enter_raw_mode(self):
+        try:
+            self.old_settings = termios.tcgetattr(sys.stdin)
+        except (termios.error, OSError):
+            return False
+        tty.setraw(sys.stdin.fileno())
+        # Keep output processing, so text printed between screens starts at the left margin
+        mode = termios.tcgetattr(sys.stdin)
+        mode[1] = self.old_settings[1]
+        termios.tcsetattr(sys.stdin, termios.TCSADRAIN, mode)
+        watch_signals()
+        probe_sync_update()
+        return True
+
+    def restore(self):
+        if self.old_settings is not None:
+            termios.tcsetattr(sys.stdin, termios.TCSADRAIN, self.old_settings)
+            self.old_settings = None
+
+    def wait(self, timeout):
+        """Wait up to timeout seconds for input; returns the key that arrived, if any"""
+        fds = list(self.readers)
+        if self.interactive:
+            fds.append(sys.stdin)
+        if signal_wakeup_fd is not None:
+            fds.append(signal_wakeup_fd)
+        ready = select.select(fds, [], [], timeout)[0]
+        if signal_wakeup_fd in ready:
+            try:
+                os.read(signal_wakeup_fd, 512)
+            except BlockingIOError:
+                pass
+        if children_exited:
+            reap_sounds()
+        for sock in ready:
+            if sock in self.readers:
+                self.readers[sock]()
+        if sys.stdin in ready:
+            return sys.stdin.read(1)
+        return None
+
+    def run(self, screen):
+        """Run a screen coroutine to the end and return its result"""
+        self.interactive = self.enter_raw_mode()
+        try:
+            timeout = next(screen)
+            while True:
+                self.run_pending()
+                timeout = screen.send(self.wait(timeout))
+        except StopIteration as done:
+            self.run_pending()
+            return done.value
+        finally:
+            self.restore()
+
+event_loop = EventLoop()
+
+class DeadlineHeap:
+    """
+    A min-heap of items by the clock time they are due, so a loop over many timers
+    only looks at the earliest one. Rescheduling or cancelling leaves the old entry
+    in place; it's recognised as stale and skipped when it reaches the top.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.due = {}
+        self.counter = 0
+
+    def __len__(self):
+        return len(self.due)
+
+    def schedule(self, item, when):
+        """(Re)schedule item at clock time when, or unschedule it if when is None"""
+        if when is None:
+            self.due.pop(item, None)
+            return
+        self.due[item] = when
+        self.counter += 1
+        heapq.heappush(self.heap, (when, self.counter, item))
+
+    def next_deadline(self):
+        """The earliest due time, or None if nothing is scheduled"""
+        heap = self.heap
+        while heap and self.due.get(heap[0][2]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def pop_due(self, now):
+        """Unschedule and return every item due by now, earliest first"""
+        items = []
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            when, _, item = heapq.heappop(heap)
+            if self.due.get(item) == when:
+                del self.due[item]
+                items.append(item)
+        return items
+
+# --- Status File ---
+class StatusFile:
+    """
+    Publishes the running timer as a fixed-layout record in a memory-mapped file, for
+    status bars and prompts that poll several times a second. The record only changes
+    on phase changes, pause/resume and autostart toggles; readers derive the time left
+    from the deadline.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.map = None
+        self.failed = False
+        self.fields = {
+            'phase': 'idle', 'kind': '', 'session': 0, 'sessions': 0, 'paused': False, 'autostart': False,
+            'deadline': 0.0, 'remaining': 0.0, 'started': 0.0, 'total': 0,
+        }
+
+    def open(self):
+        try:
+            ensure_private_dir(os.path.dirname(self.path))
+            # Never follow a symlink planted in place of the file: it would be truncated
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+            try:
+                os.ftruncate(fd, STATUS_SIZE)
+                self.map = mmap.mmap(fd, STATUS_SIZE)
+            finally:
+                os.close(fd)
+        except OSError:
+            self.failed = True  # Status bars just won't see the timer
+
+    def update(self, **fields):
+        self.fields.update(fields)
+        if self.map is None and not self.failed:
+            self.open()
+        if self.map is None:
+            return
+        f = self.fields
+        phase = STATUS_PHASES.index(f['phase']) if f['phase'] in STATUS_PHASES else 0
+        seq = STATUS_SEQ.unpack_from(self.map, 0)[0] | 1
+        STATUS_SEQ.pack_into(self.map, 0, seq)
+        STATUS_BODY.pack_into(self.map, STATUS_SEQ.size, STATUS_VERSION, phase, f['paused'], f['autostart'],
+                              clock_id, STATUS_KINDS.index(f['kind']), f['session'], f['sessions'],
+                              int(f['deadline'] * 1e9), int(f['remaining'] * 1e9), int(f['started'] * 1e9),
+                              int(f['total']), os.getpid())
+        STATUS_SEQ.pack_into(self.map, 0, (seq + 1) & 0xffffffff)
+
+    def clear(self):
+        if self.map is not None:
+            self.update(phase='idle')
+
+status_file = StatusFile(status_path())
+atexit.register(status_file.clear)
+
+# --- Frame Templates ---
+PERCENTS = tuple(str(n) for n in range(101))
+RUNNING_MESSAGE = f"{Colors.BOLD}{Colors.BLUE}press P{Colors.ENDC} for pause"
+PAUSED_MESSAGE = f"PAUSED - {Colors.BOLD}{Colors.BLUE}press P{Colors.ENDC} to continue"
+AUTOSTART_SUFFIXES = {
+    True: f" | Auto:{Colors.GREEN}ON{Colors.ENDC}",
+    False: f" | Auto:{Colors.RED}OFF{Colors.ENDC}",
+}
+# Overdue screen messages, by waiting phase
+WAIT_MESSAGES = {
+    'break-wait': f"Work Session {{session}} complete, {Colors.BOLD}{Colors.BLUE}press P{Colors.ENDC} for a break. Break Overdue:",
+    'work-wait': f"Break {{session}} complete. To start the next work session, {Colors.BOLD}{Colors.BLUE}press P{Colors.ENDC}. Work Overdue:",
+    'overdue': f"{Colors.BLUE}Press P{Colors.ENDC} to exit. Overdue:",
+}
+# Reminder sound played while waiting
+WAIT_SOUNDS = {
+    'break-wait': 'media/break-time.mp3',
+    'work-wait': 'media/back-to-work.mp3',
+    'overdue': 'media/gong.mp3',
+}
+
+@functools.lru_cache(maxsize=8)
+def bar_strings(width):
+    """Every fill level of a progress bar of the given width"""
+    return tuple(BAR_GLYPH * filled + ' ' * (width - filled) for filled in range(width + 1))
+
+class FrameTemplate:
+    """
+    A countdown status frame whose static text (message, Auto: suffix, colors) is
+    compiled once per screen state. A tick only fills the time, bar and percentage
+    slots of the preallocated parts list and joins it.
+    """
+
+    def __init__(self, message, suffix, with_bar):
+        tail = message + suffix
+        self.with_bar = with_bar
+        if with_bar:
+            self.parts = [Colors.BOLD + Colors.YELLOW, '', Colors.ENDC + ' [', '', '] ', '', '% ' + tail]
+            self.static_width = get_visual_length(tail) + 6
+        else:
+            self.parts = [Colors.BOLD + Colors.YELLOW, '', Colors.ENDC + ' ' + tail]
+            self.static_width = get_visual_length(tail) + 1
+
+    def fill(self, time_str, bar='', bar_cells=0, progress=''):
+        """Return the frame and its visible width"""
+        parts = self.parts
+        parts[1] = time_str
+        if self.with_bar:
+            parts[3] = bar
+            parts[5] = progress
+        return ''.join(parts), self.static_width + len(time_str) + bar_cells + len(progress)
+
+@functools.lru_cache(maxsize=64)
+def frame_template(message, suffix, with_bar):
+    return FrameTemplate(message, suffix, with_bar)
+
+def display_time(initial_total, remaining_seconds, message="", autostart=None, use_cursor_saving=False):
+    """Draw the countdown line; autostart is shown unless it is None"""
+    time_str = format_clock(remaining_seconds)
+    suffix = AUTOSTART_SUFFIXES[autostart] if autostart is not None else ""
+
+    if layout.refresh():
+        status_renderer.invalidate()
+
+    template = frame_template(message, suffix, initial_total > 0)
+    if initial_total > 0:
+        progress = int(((initial_total - remaining_seconds) / initial_total) * 100)
+        # Size the bar for the widest percentage, so it doesn't change width while counting
+        width = layout.bar_width(template.static_width + len(time_str) + 3)
+        filled = int((progress / 100.0) * width)
+        bar_cells = filled * get_visual_length(BAR_GLYPH) + (width - filled)
+        full_str, visual_length = template.fill(time_str, bar_strings(width)[filled], bar_cells, PERCENTS[progress])
+    else:
+        full_str, visual_length = template.fill(time_str)
+
+    # Handle terminal width to prevent line wrapping issues
+    if visual_length > layout.columns:
+        full_str = truncate_visual(full_str, layout.columns)
+
+    if use_cursor_saving:
+        status_renderer.draw(full_str)
+    else:
+        sys.stdout.write(f'\x1b[2K{full_str}\r')
+        sys.stdout.flush()
+
+def display_overdue(prefix, prefix_width, elapsed):
+    overdue_str = format_duration(int(elapsed))
+
+    # Handle terminal width - allow wrapping to second line for overdue timer
+    layout.refresh()
+
+    # Calculate how many lines the content will span
+    lines_needed = layout.lines_needed(prefix_width + len(overdue_str))
+
+    # Clear all lines that might contain content, move back down to the original
+    # position and display the content (allowing natural wrapping), all in one write
+    write_frame('\x1b[2K\x1b[1A' * lines_needed + '\x1b[1B' + prefix + overdue_str + '\r')
+
+def next_tick_timeout(remaining):
+    """Seconds until the displayed value changes, i.e. the next whole-second boundary of the deadline"""
+    fraction = remaining % 1.0
+    return fraction if fraction > 0 else 1.0
+
+def record_drift(drift):
+    """Keep track of how far countdowns overshoot their planned running time"""
+    drift_ms = round(drift * 1000, 3)
+    debug_stats['countdowns'] = debug_stats.get('countdowns', 0) + 1
+    debug_stats['last_drift_ms'] = drift_ms
+    debug_stats['max_drift_ms'] = max(debug_stats.get('max_drift_ms', drift_ms), drift_ms)
+
+def countdown(total_seconds, session=None, resume=None):
+    """
+    Count down to an absolute deadline on the configured clock (see clock_now).
+    A screen coroutine, run by the event loop.
+
+    Remaining time is always derived from the deadline, so keypresses and render
+    cost don't accumulate as drift, and after a resume the screen jumps straight
+    to the current state. Pausing stores the exact fractional remainder.
+    With a SessionState, its autostart setting is shown and toggled by the A key, and
+    the countdown is checkpointed. Given the checkpoint record of a resumed run, it
+    carries on to the saved deadline, or paused with the saved remainder.
+    """
+    initial_total = total_seconds
+    planned = total_seconds
+    paused = False
+    start_time = phase_started = clock_now()
+    if resume is not None:
+        paused = resume['paused']
+        planned = resume['remaining'] if paused else max(resume['deadline'] - clock.wall(), 0.0)
+        phase_started = clock_time(resume['started'])
+    deadline = start_time + planned
+    paused_remaining = planned if paused else 0.0
+    paused_at = start_time
+    paused_total = 0.0
+    status_file.update(deadline=deadline, started=start_time, total=total_seconds, paused=paused, remaining=paused_remaining)
+    autostart = session.autostart if session else None
+    if session:
+        checkpoint.save(**session.to_dict(), deadline=wall_time(deadline), started=wall_time(phase_started),
+                        paused=paused, remaining=paused_remaining)
+
+    if event_loop.interactive:
+        try:
+            # Start on a new line and save cursor position
+            sys.stdout.write('\n')
+            sys.stdout.write('\x1b[s')
+            sys.stdout.flush()
+            status_renderer.invalidate()
+
+            watch = ClockWatch()
+            timeout = None
+            while True:
+                now, jumped = watch.check(timeout)
+                if jumped:
+                    # Redraw everything after a resume in case the terminal was touched meanwhile
+                    status_renderer.invalidate()
+                remaining = paused_remaining if paused else max(deadline - now, 0.0)
+                shown_seconds = math.ceil(remaining)
+                if paused:
+                    display_time(initial_total, shown_seconds, PAUSED_MESSAGE, autostart, use_cursor_saving=True)
+                else:
+                    display_time(initial_total, shown_seconds, RUNNING_MESSAGE, autostart, use_cursor_saving=True)
+
+                if remaining <= 0:
+                    break
+
+                # While paused nothing on screen changes, so just wait for a key
+                timeout = None if paused else next_tick_timeout(remaining)
+                key = yield timeout
+                if key is not None:
+                    if key == '\x03':
+                        raise KeyboardInterrupt
+                    # Check for 'p' in English and other layouts (e.g., 'з' in Russian)
+                    if key.lower() in ['p', 'з']:
+                        now = clock_now()
+                        if paused:
+                            deadline = now + paused_remaining
+                            paused_total += now - paused_at
+                        else:
+                            paused_remaining = max(deadline - now, 0.0)
+                            paused_at = now
+                            journal.pause()
+                        paused = not paused
+                        status_file.update(paused=paused, deadline=deadline, remaining=paused_remaining)
+                        if session:
+                            checkpoint.save(paused=paused, deadline=wall_time(deadline), remaining=paused_remaining)
+                    elif key.lower() == 'a' and session:
+                        session.autostart = autostart = not session.autostart
+                        status_file.update(autostart=autostart)
+                        checkpoint.save(autostart=autostart)
+        finally:
+            status_renderer.finish()
+    else:
+        # Fallback for non-terminal environments
+        while True:
+            remaining = max(deadline - clock_now(), 0.0)
+            display_time(initial_total, math.ceil(remaining), "", autostart, use_cursor_saving=False)
+            if remaining <= 0:
+                break
+            yield next_tick_timeout(remaining)
+
+    record_drift(clock_now() - start_time - paused_total - planned)
+
+def wait_for_p(message, sound_filename=None, interval=120, started=None):
+    """
+    Wait for user to press 'p' key while displaying a message and optional periodic notifications.
+    A screen coroutine, run by the event loop.
+
+    Args:
+        message: The message to display with elapsed time
+        sound_filename: Optional sound file to play at intervals
+        interval: Seconds between sound/GUI notifications (default 120, but 60 for tcount overdue)
+        started: Clock time the wait began, if earlier than now (a resumed run)
+    """
+    start_time = clock_now() if started is None else started
+    last_sound_time = start_time
+    status_file.update(started=start_time)
+    # The overdue screen's static text, compiled once
+    overdue_prefix = f"{message} "
+    overdue_prefix_width = get_visual_length(overdue_prefix)
+
+    if not event_loop.interactive:
+        # If no terminal control available, just return immediately
+        return
+
+    watch = ClockWatch()
+    timeout = None
+    while True:
+        # After a suspend at most one reminder fires and the schedule restarts from now,
+        # instead of replaying every missed interval
+        current_time, _ = watch.check(timeout)
+        if sound_filename and (current_time - last_sound_time) >= interval:
+            event_loop.call_soon(play_sound, sound_filename)
+            last_sound_time = current_time
+            # Send critical notification that lasts until dismissed (no expire-time)
+            # Updated in place, so the daemon holds a single entry however long this takes
+            event_loop.call_soon(notify, f"Timer overdue by {int((current_time - start_time) // 60)} minutes", 'critical', None, False, OVERDUE_SLOT)
+        display_overdue(overdue_prefix, overdue_prefix_width, current_time - start_time)
+        timeout = next_tick_timeout(-(current_time - start_time))
+        key = yield timeout
+        if key is not None:
+            if key == '\x03':
+                raise KeyboardInterrupt
+            # Check for 'p' in English and other layouts (e.g., 'з' in Russian)
+            if key.lower() in ['p', 'з']:
+                event_loop.call_soon(notifications.submit, dismiss_timer_notifications)
+                break
+
+def ask_continue():
+    """Ask whether to add another run; a screen coroutine that returns the answer"""
+    if not event_loop.interactive:
+        return False
+
+    try:
+        print("  All work sessions complete. Add another run? y/n: ", end='', flush=True)
+
+        while True:
+            key = yield None
+            if key is not None:
+                key = key.lower()
+
+                if key == 'y':
+                    print('y')
+                    return True
+                elif key == 'n':
+                    print('n')
+                    return False
+                elif key == '\x03':
+                    print('^C')
+                    raise KeyboardInterrupt
+    finally:
+        print()
+
+# --- Session State ---
+# Where each state of a Pomodoro run leads, by the event that ends it. Countdowns end with
+# 'elapsed', or 'autostart' to skip the wait that would follow, and the last work session
+# with 'final'. Waits end with 'press' (the P key), the question with 'yes' or 'no'.
+SESSION_TRANSITIONS = {
+    'work': {'elapsed': 'break-wait', 'autostart': 'break', 'final': 'ask-continue'},
+    'break-wait': {'press': 'break'},
+    'break': {'elapsed': 'work-wait', 'autostart': 'work'},
+    'work-wait': {'press': 'work'},
+    'ask-continue': {'yes': 'break', 'no': 'done'},
+    'done': {},
+}
+
+class SessionState:
+    """
+    Where a Pomodoro run is: its state in SESSION_TRANSITIONS, the current work session,
+    the planned number of sessions and whether autostart is on. Entering work starts the
+    next session and answering yes adds one. It holds no timing, so one process can keep
+    many, and to_dict()/from_dict() save and restore it.
+    """
+    __slots__ = ('state', 'session', 'sessions', 'autostart')
+
+    def __init__(self, sessions, autostart=False, state=None, session=None):
+        if state is None:
+            state = 'work' if sessions > 0 else 'done'
+        if session is None:
+            session = 1 if sessions > 0 else 0
+        if state not in SESSION_TRANSITIONS:
+            raise ValueError(f"Unknown session state '{state}'")
+        self.state = state
+        self.session = session
+        self.sessions = sessions
+        self.autostart = autostart
+
+    def fire(self, event):
+        """Leave the current state on event; returns the new state"""
+        state = SESSION_TRANSITIONS[self.state].get(event)
+        if state is None:
+            raise ValueError(f"No transition from '{self.state}' on '{event}'")
+        if state == 'work':
+            self.session += 1
+        elif event == 'yes':
+            self.sessions += 1
+        self.state = state
+        return state
+
+    def finish(self):
+        """The countdown of the current state ran out; returns the new state"""
+        if self.state == 'work' and self.session >= self.sessions:
+            return self.fire('final')
+        return self.fire('autostart' if self.autostart else 'elapsed')
+
+    def to_dict(self):
+        return {'state': self.state, 'session': self.session, 'sessions': self.sessions, 'autostart': self.autostart}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['sessions'], data['autostart'], data['state'], data['session'])
+
+# --- Checkpoints ---
+# The checkpoint record: the version, session state, autostart and paused bytes, the
+# session index and count, the work and break seconds, then the deadline and phase
+# start as wall-clock ns and the remaining time (while paused) in ns
+CHECKPOINT = struct.Struct('<BBBBIIIIqqq')
+CHECKPOINT_VERSION = 1
+CHECKPOINT_STATES = tuple(SESSION_TRANSITIONS)
+
+def state_path(name):
+    """A per-user file that outlives reboots, in $XDG_STATE_HOME/pomotimer"""
+    state_dir = os.environ.get('XDG_STATE_HOME') or os.path.expanduser('~/.local/state')
+    return os.path.join(state_dir, 'pomotimer', name)
+
+def wall_time(when):
+    """A time on the timer clock as a wall-clock time"""
+    return when + clock.wall() - clock_now()
+
+def clock_time(wall):
+    """A wall-clock time as a time on the timer clock"""
+    return wall + clock_now() - clock.wall()
+
+class Checkpoint:
+    """
+    Saves the running tpom whenever its phase changes, it is paused or resumed or autostart
+    is toggled, so `pomotimer resume` can pick it up after the terminal was closed or the
+    machine rebooted. Times are stored as wall-clock times, since the timer clocks start
+    over on boot. Each record goes to a temporary file that is synced and renamed over the
+    previous one, so a crash leaves one or the other, never a mix.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.failed = False
+        self.fields = {}
+
+    def start(self, work_seconds, break_seconds):
+        """Begin a new record for a run; nothing is written until the first save()"""
+        self.fields = {'work': work_seconds, 'break': break_seconds, 'deadline': 0.0, 'started': 0.0,
+                       'remaining': 0.0, 'paused': False}
+
+    def save(self, **fields):
+        self.fields.update(fields)
+        if self.failed:
+            return
+        f = self.fields
+        record = CHECKPOINT.pack(CHECKPOINT_VERSION, CHECKPOINT_STATES.index(f['state']), f['autostart'], f['paused'],
+                                 f['session'], f['sessions'], f['work'], f['break'],
+                                 int(f['deadline'] * 1e9), int(f['started'] * 1e9), int(f['remaining'] * 1e9))
+        temp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            try:
+                os.write(fd, record)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            os.replace(temp_path, self.path)
+        except OSError:
+            self.failed = True  # The run just can't be resumed
+
+    def load(self):
+        """The saved run as a dict, or None if there is none or it can't be read"""
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read(CHECKPOINT.size + 1)
+        except OSError:
+            return None
+        if len(data) != CHECKPOINT.size:
+            return None
+        version, state, autostart, paused, session, sessions, work, brk, deadline_ns, started_ns, remaining_ns = CHECKPOINT.unpack(data)
+        if version != CHECKPOINT_VERSION or state >= len(CHECKPOINT_STATES):
+            return None
+        return {
+            'state': CHECKPOINT_STATES[state],
+            'session': session,
+            'sessions': sessions,
+            'autostart': bool(autostart),
+            'paused': bool(paused),
+            'work': work,
+            'break': brk,
+            'deadline': deadline_ns / 1e9,
+            'started': started_ns / 1e9,
+            'remaining': remaining_ns / 1e9,
+        }
+
+    def clear(self):
+        self.fields = {}
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+checkpoint = Checkpoint(state_path('checkpoint'))
+
+class RunLock:
+    """
+    Held by the terminal run or the daemon that owns the checkpoint and the status file,
+    so a second one can't overwrite the first one's record or clear it on exit. The lock
+    is released with the process, however it ends; the file keeps the holder's pid.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def acquire(self):
+        """False if another process holds the lock"""
+        try:
+            os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        except OSError:
+            return True  # Without a state directory there's no checkpoint to protect
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        except OSError:
+            os.close(fd)
+            return True
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self.fd = fd
+        return True
+
+    def holder(self):
+        """The pid of the process holding the lock, or None if unknown"""
+        try:
+            with open(self.path) as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+run_lock = RunLock(state_path('lock'))
+
+def claim_run_lock():
+    """Exit with an error if another terminal run or the daemon owns the checkpoint and status file"""
+    if run_lock.acquire():
+        return
+    holder = run_lock.holder()
+    running = f" (pid {holder})" if holder is not None else ""
+    print(f"{Colors.RED}Error: Another pomotimer{running} is running a timer or the daemon. Stop it first.{Colors.ENDC}")
+    sys.exit(1)
+
+# --- History ---
+class Journal:
+    """
+    Appends each phase of a terminal run, once it ends, to a JSON lines history:
+    its start (ts, wall-clock seconds), kind, phase, planned and actual seconds, seconds
+    overdue (the length of a wait) and the number of pauses, plus "cancelled" if the run
+    was cancelled during it. The file is opened on the first entry and kept open; each
+    entry is flushed and synced as it is written, i.e. at phase boundaries only.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.failed = False
+        self.entry = None
+
+    def begin(self, kind, phase, planned=0, started=None):
+        self.entry = {'kind': kind, 'phase': phase, 'planned': planned,
+                      'started': clock_now() if started is None else started, 'pauses': 0}
+
+    def pause(self):
+        if self.entry is not None:
+            self.entry['pauses'] += 1
+
+    def end(self, cancelled=False):
+        """The current phase is over; appends its entry"""
+        entry, self.entry = self.entry, None
+        if entry is None:
+            return
+        actual = round(clock_now() - entry['started'], 1)
+        record = {
+            'ts': int(wall_time(entry['started'])),
+            'kind': entry['kind'],
+            'phase': entry['phase'],
+            'planned': entry['planned'],
+            'actual': actual,
+            'overdue': actual if entry['phase'] in WAITING_PHASES else 0,
+            'pauses': entry['pauses'],
+        }
+        if cancelled:
+            record['cancelled'] = True
+        self.write(record)
+
+    def write(self, record):
+        if self.failed:
+            return
+        try:
+            if self.file is None:
+                os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+                self.file = open(self.path, 'a', encoding='utf-8')
+            self.file.write(json.dumps(record, separators=(',', ':')) + '\n')
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        except OSError:
+            self.failed = True  # Stats will just miss these runs
+
+journal = Journal(state_path('history.jsonl'))
+
+# --- Stats ---
+# The rollup file: a header with the version and how many bytes of the history are rolled
+# up, then one record per day, sorted by day: the local day (days since 1970-01-01), focus
+# seconds, completed work sessions, seconds overdue before breaks, the number of them and
+# the streak, i.e. the days in a row up to this one with a completed session
+ROLLUP_HEADER = struct.Struct('<B7xQ')
+ROLLUP_DAY = struct.Struct('<iIIIII')
+ROLLUP_VERSION = 1
+# History lines parsed at once while rolling up
+ROLLUP_PARSE_BLOCK = 4096
+def day_number(ts):
+    """The local calendar day of a wall-clock time, as days since 1970-01-01"""
+    return int(ts + time.localtime(ts).tm_gmtoff) // 86400
+
+def day_string(day):
+    return time.strftime('%Y-%m-%d', time.gmtime(day * 86400))
+
+def parse_day(text):
+    try:
+        return day_number(time.mktime(time.strptime(text, '%Y-%m-%d')))
+    except (ValueError, OverflowError):
+        print(f"{Colors.RED}Error: Invalid date '{text}'. Use format like '2025-01-31'.{Colors.ENDC}")
+        sys.exit(1)
+
+def roll_up(lines, days):
+    """Add a block of history lines to the per-day totals in days"""
+    # Most lines are other phases; skip them before paying for the JSON parse
+    lines = [line for line in lines if b'"work"' in line or b'"break-wait"' in line]
+    try:
+        # One parse for the whole block is several times faster than one per line
+        entries = json.loads(b'[' + b','.join(lines) + b']')
+    except ValueError:
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                pass  # A damaged line only costs its own entry
+    for entry in entries:
+        try:
+            if entry['kind'] != 'tpom':
+                continue
+            totals = days.setdefault(day_number(entry['ts']), [0, 0, 0, 0])
+            if entry['phase'] == 'work':
+                if entry.get('cancelled'):
+                    totals[0] += int(min(entry['actual'], entry['planned']))
+                else:
+                    totals[0] += int(entry['planned'])
+                    totals[1] += 1
+            elif entry['phase'] == 'break-wait':
+                totals[2] += int(entry['overdue'])
+                totals[3] += 1
+        except (KeyError, TypeError, ValueError):
+            pass
+
+class Rollups:
+    """
+    Per-day totals of the history, kept up to date incrementally: the header records how
+    many bytes of the history are rolled up, so a refresh only reads what was appended
+    since. Days are fixed-size records sorted by day, so a query binary-searches its range
+    and reads just those records, however many years the history spans.
+    """
+
+    def __init__(self, path, history_path):
+        self.path = path
+        self.history_path = history_path
+
+    @staticmethod
+    def search(f, day):
+        """Index of the first day record on or after day"""
+        low, high = 0, (f.seek(0, os.SEEK_END) - ROLLUP_HEADER.size) // ROLLUP_DAY.size
+        while low < high:
+            middle = (low + high) // 2
+            f.seek(ROLLUP_HEADER.size + middle * ROLLUP_DAY.size)
+            if ROLLUP_DAY.unpack(f.read(ROLLUP_DAY.size))[0] < day:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def refresh(self):
+        """Roll up the history appended since the last refresh"""
+        try:
+            size = os.path.getsize(self.history_path)
+        except OSError:
+            size = 0
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        with open(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600), 'r+b') as f:
+            header = f.read(ROLLUP_HEADER.size)
+            covered = 0
+            if len(header) == ROLLUP_HEADER.size:
+                version, covered = ROLLUP_HEADER.unpack(header)
+                if covered == size and version == ROLLUP_VERSION:
+                    return
+                # A new version, or a history that was truncated or replaced: start over
+                if version != ROLLUP_VERSION or covered > size:
+                    covered = 0
+            rebuild = covered == 0
+
+            days = {}
+            if size > covered:
+                with open(self.history_path, 'rb') as history:
+                    history.seek(covered)
+                    block = []
+                    for line in history:
+                        # Stop at a line still being written, or one appended after we looked
+                        if not line.endswith(b'\n') or covered + len(line) > size:
+                            break
+                        covered += len(line)
+                        block.append(line)
+                        if len(block) == ROLLUP_PARSE_BLOCK:
+                            roll_up(block, days)
+                            block = []
+                    roll_up(block, days)
+
+            # Cover nothing while records are rewritten, so a crash meanwhile means a rebuild
+            f.seek(0)
+            f.write(ROLLUP_HEADER.pack(ROLLUP_VERSION, 0))
+            f.flush()
+            # New entries are almost always for the last day, so only its record is rewritten
+            first = 0 if rebuild else self.search(f, min(days, default=sys.maxsize))
+            previous_day, streak = None, 0
+            if first > 0:
+                f.seek(ROLLUP_HEADER.size + (first - 1) * ROLLUP_DAY.size)
+                previous_day, *_, streak = ROLLUP_DAY.unpack(f.read(ROLLUP_DAY.size))
+            if not rebuild:
+                f.seek(ROLLUP_HEADER.size + first * ROLLUP_DAY.size)
+                for day, *totals, _ in ROLLUP_DAY.iter_unpack(f.read()):
+                    merged = days.setdefault(day, [0, 0, 0, 0])
+                    for i, value in enumerate(totals):
+                        merged[i] += value
+            records = []
+            for day in sorted(days):
+                totals = days[day]
+                if not totals[1]:
+                    streak = 0
+                elif previous_day is not None and day == previous_day + 1:
+                    streak += 1
+                else:
+                    streak = 1
+                previous_day = day
+                records.append(ROLLUP_DAY.pack(day, *totals, streak))
+            f.seek(ROLLUP_HEADER.size + first * ROLLUP_DAY.size)
+            f.write(b''.join(records))
+            f.truncate()
+            f.flush()
+            f.seek(0)
+            f.write(ROLLUP_HEADER.pack(ROLLUP_VERSION, covered))
+
+    def query(self, first_day, last_day):
+        """The day records (day, focus, sessions, overdue, breaks) from first_day to last_day"""
+        try:
+            f = open(self.path, 'rb')
+        except OSError:
+            return []
+        with f:
+            start = self.search(f, first_day)
+            end = self.search(f, last_day + 1)
+            if end <= start:
+                return []
+            f.seek(ROLLUP_HEADER.size + start * ROLLUP_DAY.size)
+            return list(ROLLUP_DAY.iter_unpack(f.read((end - start) * ROLLUP_DAY.size)))
+
+    def streak(self, today):
+        """Days in a row with a completed session, up to today or, if none yet today, yesterday"""
+        for day, *_, streak in reversed(self.query(today - 1, today)):
+            if streak:
+                return streak
+        return 0
+
+def longest_streak(records):
+    """The most days in a row with a completed session within the days of a query()"""
+    longest = 0
+    for day, *_, streak in records:
+        # A streak that started before the first day only counts from there
+        longest = max(longest, min(streak, day - records[0][0] + 1))
+    return longest
+
+def format_days(count):
+    return f"{count} day" if count == 1 else f"{count} days"
+
+def run_stats(period='day', range_text=None):
+    today = day_number(time.time())
+    if range_text:
+        first, _, last = range_text.partition(':')
+        first_day = parse_day(first)
+        last_day = parse_day(last) if last else today
+        if first_day > last_day:
+            print(f"{Colors.RED}Error: Invalid range '{range_text}'. The first day must not be after the last.{Colors.ENDC}")
+            sys.exit(1)
+    elif period == 'week':
+        first_day, last_day = today - 6, today
+    else:
+        first_day = last_day = today
+
+    rollups = Rollups(state_path('history.days'), journal.path)
+    try:
+        rollups.refresh()
+    except OSError as e:
+        print(f"{Colors.YELLOW}Warning: Could not update the stats from the history: {e}{Colors.ENDC}")
+    records = rollups.query(first_day, last_day)
+    focus = sum(record[1] for record in records)
+    sessions = sum(record[2] for record in records)
+    overdue = sum(record[3] for record in records)
+    breaks = sum(record[4] for record in records)
+
+    period_str = day_string(first_day) if first_day == last_day else f"{day_string(first_day)} to {day_string(last_day)}"
+    print(f"{Colors.BOLD}Stats for {period_str}{Colors.ENDC}")
+    print(f"  Focus:              {Colors.BOLD}{Colors.GREEN}{focus // 60} min{Colors.ENDC}")
+    print(f"  Sessions completed: {Colors.BOLD}{sessions}{Colors.ENDC}")
+    if breaks:
+        print(f"  Avg break overdue:  {Colors.BOLD}{format_clock(overdue // breaks)}{Colors.ENDC} ({breaks} breaks)")
+    else:
+        print("  Avg break overdue:  -")
+    print(f"  Streak:             {Colors.BOLD}{format_days(rollups.streak(today))}{Colors.ENDC}"
+          f" (longest in period: {format_days(longest_streak(records))})")
+
+# --- Core Functions ---
+
+def pomodoro(work_time, break_time, sessions, autostart=False):
+    """A whole Pomodoro run, as a screen coroutine"""
+    durations = {'work': int(parse_time(work_time)), 'break': int(parse_time(break_time))}
+    event_loop.call_soon(play_sound, 'media/aight-let-s-do-it.mp3')
+    yield from pomodoro_states(SessionState(sessions, autostart), durations)
+
+def resumed_pomodoro(record):
+    """A Pomodoro run restored from its checkpoint, as a screen coroutine"""
+    print(f"\n{Colors.YELLOW}Resuming session {record['session']} of {record['sessions']} ({record['state']}).{Colors.ENDC}")
+    durations = {'work': record['work'], 'break': record['break']}
+    yield from pomodoro_states(SessionState.from_dict(record), durations, record)
+
+def pomodoro_states(session, durations, resume=None):
+    """
+    Run a SessionState through its phases until it is done, checkpointing each one.
+    resume is the checkpoint record of the phase it is in, to pick that phase up where it was.
+    """
+    checkpoint.start(durations['work'], durations['break'])
+    declined = False
+    while session.state != 'done':
+        state = session.state
+        if state == 'work':
+            print(f"""
+            {Colors.BOLD}{Colors.GREEN}--- Work Session {session.session} ---
+            {Colors.ENDC}""")
+        elif state == 'break':
+            print(f"""
+                {Colors.BOLD}{Colors.RED}--- Break {session.session} ---
+                {Colors.ENDC}""")
+        status_file.update(phase=state, kind='tpom', session=session.session, sessions=session.sessions, autostart=session.autostart)
+        started = clock_now() if resume is None else clock_time(resume['started'])
+        # Without a terminal, waits and the prompt return at once; they never ran
+        if state in COUNTING_PHASES or event_loop.interactive:
+            journal.begin('tpom', state, durations.get(state, 0), started)
+
+        if state == 'work' or state == 'break':
+            yield from countdown(durations[state], session, resume)
+            journal.end()
+            if state == 'work':
+                event_loop.call_soon(play_sound, get_work_complete_sound())
+                event_loop.call_soon(notify, f"Work session {session.session} complete. Time for a break!")
+            else:
+                event_loop.call_soon(play_sound, 'media/back-to-work.mp3')
+                event_loop.call_soon(notify, f"""Break {session.session} complete. Time for work!""")
+            print() # Print a newline after the timer is done
+            session.finish()
+        elif state == 'ask-continue':
+            checkpoint.save(**session.to_dict(), started=wall_time(started))
+            declined = not (yield from ask_continue())
+            journal.end()
+            session.fire('no' if declined else 'yes')
+        else:
+            checkpoint.save(**session.to_dict(), started=wall_time(started))
+            yield from wait_for_p(WAIT_MESSAGES[state].format(session=session.session), WAIT_SOUNDS[state], started=started)
+            journal.end()
+            session.fire('press')
+        resume = None
+    checkpoint.clear()
+
+    print(f"""
+        {Colors.BOLD}{Colors.PURPLE}*** Pomodoro Complete! ***
+        {Colors.ENDC}""")
+    if declined:
+        event_loop.call_soon(play_detached_sound, 'media/have-a-good-one.mp3')
+
+def countdown_timer(time_str):
+    """A tcount run, as a screen coroutine"""
+    print(f"""
+
+        {Colors.BOLD}{Colors.GREEN}--- Countdown Timer ---
+        {Colors.ENDC}""")
+
+    event_loop.call_soon(play_sound, 'media/bell.mp3')
+
+    total_seconds = int(parse_time(time_str))
+
+    status_file.update(phase='countdown', kind='tcount')
+    journal.begin('tcount', 'countdown', total_seconds)
+    yield from countdown(total_seconds)
+    journal.end()
+
+    print(f"""
+
+
+
+        {Colors.BOLD}{Colors.PURPLE}*** Timer Complete! ***
+        {Colors.ENDC}
+
+        """)
+    event_loop.call_soon(play_detached_sound, 'media/gong.mp3')
+
+    # Send critical notification for timer completion (persistent, no auto-expire)
+    event_loop.call_soon(notify, "Timer Complete!", 'critical', None, False, OVERDUE_SLOT)
+
+    # Enter overdue tracking phase with 1-minute notification intervals
+    status_file.update(phase='overdue')
+    if event_loop.interactive:
+        journal.begin('tcount', 'overdue')
+    yield from wait_for_p(WAIT_MESSAGES['overdue'], WAIT_SOUNDS['overdue'], 60)
+    journal.end()
+
+def run_pomodoro(work_time, break_time, sessions, autostart=False):
+    claim_run_lock()
+    try:
+        event_loop.run(pomodoro(work_time, break_time, sessions, autostart))
+    except KeyboardInterrupt:
+        journal.end(cancelled=True)
+        checkpoint.clear()
+        print(f"""
+
+        {Colors.BOLD}{Colors.RED}Timer Cancelled.{Colors.ENDC}
+        """)
+        sys.exit(0)
+
+def run_resume():
+    # A running tpom still owns its checkpoint
+    claim_run_lock()
+    record = checkpoint.load()
+    if record is None:
+        print(f"{Colors.YELLOW}No interrupted Pomodoro run to resume.{Colors.ENDC}")
+        sys.exit(1)
+    try:
+        event_loop.run(resumed_pomodoro(record))
+    except KeyboardInterrupt:
+        journal.end(cancelled=True)
+        checkpoint.clear()
+        print(f"""
+
+        {Colors.BOLD}{Colors.RED}Timer Cancelled.{Colors.ENDC}
+        """)
+        sys.exit(0)
+
+def run_countdown(time_str):
+    claim_run_lock()
+    try:
+        event_loop.run(countdown_timer(time_str))
+    except KeyboardInterrupt:
+        journal.end(cancelled=True)
+        print(f"""
+
+        {Colors.BOLD}{Colors.RED}Timer Cancelled.{Colors.ENDC}
+        """)
+        sys.exit(0)
+
+# --- Multiple Timers ---
+# Finished timers named in the completion notification before it says "and N more"
+MULTI_NOTIFY_NAMES = 3
+
+class NamedTimer:
+    """One countdown of a multi-timer run"""
+    __slots__ = ('name', 'total', 'deadline')
+
+    def __init__(self, name, total, deadline):
+        self.name = name
+        self.total = total
+        self.deadline = deadline
+
+def parse_timer_specs(specs):
+    """NAME=TIME arguments as (name, seconds) pairs; a bare TIME is named after its position"""
+    timers = []
+    for number, spec in enumerate(specs, 1):
+        name, separator, time_str = spec.rpartition('=')
+        timers.append((name if separator and name else f"timer {number}", int(parse_time(time_str))))
+    return timers
+
+def timer_line(timer, now, name_width, bar_width):
+    name = timer.name + ' ' * (name_width - get_visual_length(timer.name))
+    remaining = timer.deadline - now
+    if remaining <= 0:
+        return f"{name}  {Colors.BOLD}{Colors.PURPLE}DONE{Colors.ENDC} +{format_clock(int(-remaining))}"
+    shown_seconds = math.ceil(remaining)
+    progress = int((timer.total - shown_seconds) / timer.total * 100) if timer.total > 0 else 0
+    bar = bar_strings(bar_width)[progress * bar_width // 100]
+    return f"{name}  {Colors.BOLD}{Colors.YELLOW}{format_clock(shown_seconds)}{Colors.ENDC} [{bar}] {PERCENTS[progress]}%"
+
+def draw_timers(timers, now, name_width, drawn):
+    """
+    Redraw the multi-timer view over the previous one (the lines in drawn), in one write,
+    unless nothing changed. Only as many timers as fit the terminal are shown, soonest
+    first, and lines are cut to the width so none wraps. Returns the lines now shown.
+    """
+    layout.refresh()
+    limit = max(layout.rows - 3, 1)
+    shown = timers if len(timers) <= limit else timers[:limit - 1]
+    bar_width = layout.bar_width(name_width + 18)
+    lines = [truncate_visual(timer_line(timer, now, name_width, bar_width), layout.columns - 1) for timer in shown]
+    if len(shown) < len(timers):
+        lines.append(f"... and {len(timers) - len(shown)} more")
+    if lines == drawn:
+        return drawn
+    move_up = f'\x1b[{len(drawn) - 1}A' if len(drawn) > 1 else ''
+    write_frame(move_up + '\r' + '\x1b[K\n'.join(lines) + '\x1b[K\x1b[J')
+    debug_stats['multi_renders'] = debug_stats.get('multi_renders', 0) + 1
+    return lines
+
+def multi_timers(specs):
+    """
+    Several named countdowns side by side, as a screen coroutine. Deadlines sit in a
+    min-heap, and the view is redrawn once a second on a boundary shared by all timers,
+    so the loop wakes up for the next redraw or the earliest deadline, however many
+    timers there are. P clears the finished timers; the run ends when none are left.
+    """
+    start = clock_now()
+    timers = sorted((NamedTimer(name, seconds, start + seconds) for name, seconds in specs), key=lambda timer: timer.deadline)
+    pending = DeadlineHeap()
+    for timer in timers:
+        pending.schedule(timer, timer.deadline)
+    name_width = max(get_visual_length(timer.name) for timer in timers)
+    finished = []
+
+    print(f"\n{Colors.BOLD}{Colors.GREEN}--- {len(timers)} Timers ---{Colors.ENDC} {Colors.BOLD}{Colors.BLUE}press P{Colors.ENDC} to clear finished ones\n")
+    drawn = []
+    try:
+        while True:
+            now = clock_now()
+            due = pending.pop_due(now)
+            if due:
+                finished.extend(due)
+                names = ', '.join(timer.name for timer in finished[:MULTI_NOTIFY_NAMES])
+                if len(finished) > MULTI_NOTIFY_NAMES:
+                    names += f" and {len(finished) - MULTI_NOTIFY_NAMES} more"
+                event_loop.call_soon(play_sound, 'media/gong.mp3')
+                event_loop.call_soon(notify, f"Timer complete: {names}", 'critical', None, False, OVERDUE_SLOT)
+            debug_stats['multi_wakeups'] = debug_stats.get('multi_wakeups', 0) + 1
+
+            if event_loop.interactive:
+                drawn = draw_timers(timers, now, name_width, drawn)
+            elif not pending:
+                return
+
+            # Next shared second boundary, or the earliest deadline if that comes first
+            timeout = 1.0 - (now - start) % 1.0
+            next_deadline = pending.next_deadline()
+            if next_deadline is not None:
+                timeout = min(timeout, max(next_deadline - now, 0.0))
+            key = yield timeout
+            if key is None:
+                continue
+            if key == '\x03':
+                raise KeyboardInterrupt
+            # Check for 'p' in English and other layouts (e.g., 'з' in Russian)
+            if key.lower() in ['p', 'з'] and finished:
+                cleared = set(finished)
+                timers = [timer for timer in timers if timer not in cleared]
+                finished = []
+                event_loop.call_soon(notifications.submit, dismiss_timer_notifications)
+                if not timers:
+                    return
+    finally:
+        sys.stdout.write('\n')
+        sys.stdout.flush()
+
+def run_multi(specs):
+    timers = parse_timer_specs(specs)
+    try:
+        event_loop.run(multi_timers(timers))
+    except KeyboardInterrupt:
+        print(f"""
+
+        {Colors.BOLD}{Colors.RED}Timers Cancelled.{Colors.ENDC}
+        """)
+        sys.exit(0)
+
+# --- Simulation ---
+# Virtual time a simulated run may cover before it is cut off, e.g. an overdue wait nobody ends
+SIMULATION_LIMIT = 24 * 3600
+SIMULATED_KEYS = {'^C': '\x03'}
+# Seeds the random sound choices, so the same run always gives the same trace
+SIMULATION_SEED = 0
+
+class SimulationEnd(Exception):
+    """A simulated run can't go on: its key script ran out or it hit the time limit"""
+
+class SimulatedLoop(EventLoop):
+    """
+    An event loop on a virtual clock with scripted keys. Waiting moves the clock straight
+    to the next wakeup or key, so a whole day of timers runs in a fraction of a second.
+    Nothing reaches the terminal, speakers or notification daemon: renders, printed text,
+    queued side effects and status changes are recorded as an event trace instead.
+    """
+
+    def __init__(self, clock, keys, limit=SIMULATION_LIMIT):
+        super().__init__()
+        self.clock = clock
+        self.keys = sorted(keys, key=lambda item: item[0])
+        self.limit = limit
+        self.trace = []
+
+    def record(self, event, **fields):
+        self.trace.append({'t': round(self.clock.now(), 3), 'event': event, **fields})
+
+    def enter_raw_mode(self):
+        return True
+
+    def restore(self):
+        pass
+
+    def write(self, frame):
+        text = ANSI_TOKEN.sub('', frame).strip()
+        if text:
+            self.record('render', text=text)
+
+    def call_soon(self, func, *args):
+        # Record what a submitted job does rather than the dispatcher it went through
+        if func == notifications.submit:
+            func, args = args[0], args[1:]
+        self.record(func.__name__, args=list(args))
+
+    def wait(self, timeout):
+        now = self.clock.now()
+        if self.keys and (timeout is None or self.keys[0][0] <= now + timeout):
+            when, key = self.keys.pop(0)
+            self.clock.advance(when - now)
+            return key
+        if timeout is None:
+            raise SimulationEnd("waiting for a key")
+        if now + timeout > self.limit:
+            raise SimulationEnd("time limit")
+        self.clock.advance(timeout)
+        return None
+
+class TraceOutput:
+    """Stands in for sys.stdout in a simulated run, recording printed text"""
+
+    def __init__(self, loop):
+        self.loop = loop
+
+    def write(self, text):
+        text = ANSI_TOKEN.sub('', text).strip()
+        if text:
+            self.loop.record('print', text=text)
+        return len(text)
+
+    def flush(self):
+        pass
+
+class TraceRenderer:
+    """Stands in for the status line renderer, handing every frame over whole"""
+
+    def draw(self, frame):
+        write_frame(frame)
+
+    def invalidate(self):
+        pass
+
+    def finish(self):
+        pass
+
+class TraceStatus:
+    """Stands in for the status file and the checkpoint, recording state changes"""
+
+    def __init__(self, loop):
+        self.loop = loop
+
+    def update(self, **fields):
+        changes = {key: fields[key] for key in ('phase', 'session', 'paused', 'autostart') if key in fields}
+        if changes:
+            self.loop.record('state', **changes)
+
+    def start(self, work_seconds, break_seconds):
+        pass
+
+    def save(self, **fields):
+        self.loop.record('checkpoint', **fields)
+
+    def clear(self):
+        pass
+
+class TraceJournal(Journal):
+    """A history journal that records its entries in the trace"""
+
+    def __init__(self, loop):
+        super().__init__(None)
+        self.loop = loop
+
+    def write(self, record):
+        self.loop.record('journal', **record)
+
+def parse_key_script(script):
+    """
+    KEY@TIME items separated by commas or whitespace, e.g. 'p@25m,a@40m,^C@120m', either
+    inline or in a file. TIME is measured from the start of the run.
+    """
+    if script is None:
+        return []
+    if os.path.isfile(script):
+        with open(script) as f:
+            script = f.read()
+    keys = []
+    for item in script.replace(',', ' ').split():
+        key, _, when = item.rpartition('@')
+        key = SIMULATED_KEYS.get(key, key)
+        if len(key) != 1 or not when:
+            print(f"{Colors.RED}Error: Invalid key '{item}', expected KEY@TIME (e.g., p@25m).{Colors.ENDC}")
+            sys.exit(1)
+        keys.append((parse_time(when), key))
+    return keys
+
+def simulate(screen, keys=(), limit=SIMULATION_LIMIT):
+    """Run a screen coroutine on a virtual clock with scripted keys; returns its event trace"""
+    global clock, event_loop, status_renderer, status_file, checkpoint, journal, layout
+    saved = (clock, event_loop, status_renderer, status_file, checkpoint, journal, layout, sys.stdout)
+    clock = VirtualClock()
+    loop = event_loop = SimulatedLoop(clock, keys, limit)
+    status_renderer = TraceRenderer()
+    status_file = checkpoint = TraceStatus(loop)
+    journal = TraceJournal(loop)
+    # A fixed 80x24 terminal, so traces don't depend on where they were recorded
+    layout = Layout()
+    layout.resized = False
+    sys.stdout = TraceOutput(loop)
+    random.seed(SIMULATION_SEED)
+    try:
+        loop.run(screen)
+        loop.record('end', reason="finished")
+    except KeyboardInterrupt:
+        journal.end(cancelled=True)
+        loop.record('end', reason="cancelled")
+    except SimulationEnd as e:
+        loop.record('end', reason=str(e))
+    finally:
+        clock, event_loop, status_renderer, status_file, checkpoint, journal, layout, sys.stdout = saved
+    return loop.trace
+
+def simulated_screen(kind, args):
+    """The screen coroutine for a simulated tcount or tpom"""
+    if kind == 'tpom':
+        return pomodoro(args['work'], args['break_time'], args['sessions'], args['autostart'])
+    return countdown_timer(args['time'])
+
+def simulation_job(job):
+    """Run one simulation of a throughput benchmark; returns the work sessions it started"""
+    kind, args, keys, limit = job
+    trace = simulate(simulated_screen(kind, args), keys, limit)
+    return sum(1 for event in trace if event['event'] == 'state' and event.get('phase') in ('work', 'countdown'))
+
+def run_simulations(kind, args, keys, limit, runs, jobs):
+    # Only the throughput benchmark needs worker processes, so other commands don't pay for the import
+    import multiprocessing
+    started = time.perf_counter()
+    with multiprocessing.Pool(jobs) as pool:
+        sessions = sum(pool.map(simulation_job, [(kind, args, keys, limit)] * runs))
+    elapsed = time.perf_counter() - started
+    print(f"{runs} runs, {sessions} sessions in {elapsed:.2f}s: "
+          f"{runs / elapsed:.1f} runs/s, {sessions / elapsed:.1f} sessions/s ({jobs or os.cpu_count()} processes)")
+
+def run_simulation(kind, args, keys, limit):
+    for event in simulate(simulated_screen(kind, args), keys, limit):
+        print(json.dumps(event, ensure_ascii=False))
+
+# --- Daemon ---
+# select() sleeps on CLOCK_MONOTONIC, which stands still during a suspend, so with the
+# boottime clock long sleeps are capped to notice deadlines that passed meanwhile
+DAEMON_MAX_SLEEP = 5.0
+DAEMON_SEND_TIMEOUT = 1.0
+
+class DaemonTimer:
+    """
+    A timer owned by the daemon. It goes through the same phases, sounds and notifications
+    as the terminal screens, but as a generator that yields the clock time it next needs
+    to run at (None to wait for a command), kept in the daemon's deadline heap, so an idle
+    daemon sleeps until the earliest deadline instead of ticking every second. Every state change is published to attached clients.
+    """
+
+    def __init__(self, daemon, name, kind, durations, sessions=0, autostart=False):
+        self.daemon = daemon
+        self.name = name
+        self.kind = kind
+        self.durations = durations
+        self.session = SessionState(sessions, autostart)
+        self.phase = 'starting'
+        self.total = 0
+        self.started = 0.0
+        self.deadline = 0.0
+        self.paused = False
+        self.paused_remaining = 0.0
+        self.acknowledged = False
+        self.answer = None
+        self.steps = self.schedule()
+
+    def snapshot(self):
+        now = clock_now()
+        remaining = 0.0
+        if self.phase in COUNTING_PHASES:
+            remaining = self.paused_remaining if self.paused else max(self.deadline - now, 0.0)
+        return {
+            'name': self.name,
+            'kind': self.kind,
+            'phase': self.phase,
+            'session': self.session.session,
+            'sessions': self.session.sessions,
+            'autostart': self.session.autostart,
+            'paused': self.paused,
+            'total': self.total,
+            'remaining': remaining,
+            'overdue': now - self.started if self.phase in WAITING_PHASES else 0.0,
+        }
+
+    def status_fields(self):
+        return {
+            'phase': self.phase, 'kind': self.kind, 'session': self.session.session, 'sessions': self.session.sessions,
+            'paused': self.paused, 'autostart': self.session.autostart, 'deadline': self.deadline,
+            'remaining': self.paused_remaining, 'started': self.started, 'total': self.total,
+        }
+
+    def set_phase(self, phase, total=0):
+        self.phase = phase
+        self.total = total
+        self.started = clock_now()
+        self.deadline = self.started + total
+        self.paused = False
+        self.daemon.publish(self)
+
+    def step(self):
+        """Run the schedule up to its next wait"""
+        try:
+            self.daemon.wakeups.schedule(self, next(self.steps))
+        except StopIteration:
+            self.daemon.wakeups.schedule(self, None)
+            self.set_phase('done')
+            self.daemon.remove(self)
+
+    def stop(self):
+        self.steps.close()
+        self.daemon.wakeups.schedule(self, None)
+        self.set_phase('stopped')
+        self.daemon.remove(self)
+
+    def press(self):
+        """The P key: pause or resume a countdown, or end an overdue wait"""
+        if self.phase in COUNTING_PHASES:
+            now = clock_now()
+            if self.paused:
+                self.deadline = now + self.paused_remaining
+            else:
+                self.paused_remaining = max(self.deadline - now, 0.0)
+            self.paused = not self.paused
+            self.daemon.publish(self)
+        elif self.phase in WAITING_PHASES:
+            self.acknowledged = True
+        self.step()
+
+    def toggle_autostart(self):
+        self.session.autostart = not self.session.autostart
+        self.daemon.publish(self)
+
+    def answer_continue(self, answer):
+        if self.phase == 'ask-continue':
+            self.answer = bool(answer)
+            self.step()
+
+    def count(self, phase, seconds):
+        self.set_phase(phase, seconds)
+        while True:
+            if self.paused:
+                yield None
+            elif self.deadline <= clock_now():
+                return
+            else:
+                yield self.deadline
+
+    def wait(self, phase, sound_filename, interval):
+        self.acknowledged = False
+        self.set_phase(phase)
+        reminder = self.started + interval
+        while not self.acknowledged:
+            now = clock_now()
+            if now >= reminder:
+                play_sound(sound_filename)
+                notify(f"Timer overdue by {int((now - self.started) // 60)} minutes", 'critical', None, warn=False,
+                       slot=timer_slot(self.name), owner=self.name)
+                reminder = now + interval
+            yield reminder
+        notifications.submit(dismiss_timer_notifications, self.name)
+
+    def ask_continue(self):
+        self.answer = None
+        self.set_phase('ask-continue')
+        while self.answer is None:
+            yield None
+
+    def schedule(self):
+        if self.kind == 'tcount':
+            play_sound('media/bell.mp3')
+            yield from self.count('countdown', self.durations[0])
+            play_detached_sound('media/gong.mp3')
+            notify("Timer Complete!", 'critical', None, warn=False, slot=timer_slot(self.name), owner=self.name)
+            yield from self.wait('overdue', WAIT_SOUNDS['overdue'], 60)
+            return
+
+        durations = dict(zip(('work', 'break'), self.durations))
+        session = self.session
+        play_sound('media/aight-let-s-do-it.mp3')
+        while session.state != 'done':
+            state = session.state
+            if state == 'work' or state == 'break':
+                yield from self.count(state, durations[state])
+                if state == 'work':
+                    play_sound(get_work_complete_sound())
+                    notify(f"Work session {session.session} complete. Time for a break!", owner=self.name)
+                else:
+                    play_sound('media/back-to-work.mp3')
+                    notify(f"Break {session.session} complete. Time for work!", owner=self.name)
+                session.finish()
+            elif state == 'ask-continue':
+                yield from self.ask_continue()
+                session.fire('yes' if self.answer else 'no')
+            else:
+                yield from self.wait(state, WAIT_SOUNDS[state], 120)
+                session.fire('press')
+        if self.answer is False:
+            play_detached_sound('media/have-a-good-one.mp3')
+
+class DaemonClient:
+    """A connection to the daemon; one request per line, or a snapshot stream once attached"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = b''
+        self.attached = None
+        self.watching_all = False
+        self.closed = False
+
+    def send(self, message):
+        try:
+            self.sock.sendall(encode_message(message))
+        except OSError:
+            # A client that stopped reading is dropped instead of stalling every timer
+            self.closed = True
+
+class Daemon:
+    """Owns every running timer and serves clients on a Unix socket from one select() loop"""
+
+    def __init__(self, path):
+        self.path = path
+        self.timers = {}
+        self.wakeups = DeadlineHeap()
+        self.clients = {}
+        self.server = None
+
+    def listen(self):
+        try:
+            ensure_private_dir(os.path.dirname(self.path))
+        except OSError as e:
+            print(f"{Colors.RED}Error: Cannot listen on {self.path}: {e}{Colors.ENDC}")
+            sys.exit(1)
+        if daemon_request({'cmd': 'status'}) is not None:
+            print(f"{Colors.RED}Error: A pomotimer daemon is already running on {self.path}.{Colors.ENDC}")
+            sys.exit(1)
+        # Its timers publish to the status file, which a terminal run may be using
+        claim_run_lock()
+        try:
+            os.unlink(self.path)  # Left behind by a daemon that didn't shut down cleanly
+        except FileNotFoundError:
+            pass
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.path)
+        os.chmod(self.path, 0o600)
+        self.server.listen(16)
+
+    def close(self):
+        for timer in list(self.timers.values()):
+            timer.stop()
+        for client in self.clients.values():
+            client.sock.close()
+        if self.server is not None:
+            self.server.close()
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+    def publish(self, timer):
+        snapshot = timer.snapshot()
+        for client in self.clients.values():
+            if client.watching_all or client.attached == timer.name:
+                client.send(snapshot)
+        if self.find(None) is timer:
+            status_file.update(**timer.status_fields())
+
+    def remove(self, timer):
+        if self.timers.get(timer.name) is timer:
+            del self.timers[timer.name]
+        # The status file falls back to the next most recent timer
+        shown = self.find(None)
+        if shown is not None:
+            status_file.update(**shown.status_fields())
+        else:
+            status_file.clear()
+        # Attached clients have seen the final snapshot and are done
+        for client in self.clients.values():
+            if client.attached == timer.name:
+                client.closed = True
+
+    def find(self, name):
+        if name:
+            return self.timers.get(name)
+        # Without a name, commands go to the most recently started timer
+        return next(reversed(self.timers.values()), None)
+
+    def start(self, request):
+        kind = request.get('kind')
+        name = request.get('name') or kind
+        if kind == 'tcount':
+            durations = (int(request['time']),)
+        elif kind == 'tpom':
+            durations = (int(request['work']), int(request['break']))
+        else:
+            return {'ok': False, 'error': f"Unknown timer kind: {kind}"}
+        if name in self.timers:
+            return {'ok': False, 'error': f"A timer named '{name}' is already running"}
+        timer = DaemonTimer(self, name, kind, durations, int(request.get('sessions', 0)), bool(request.get('autostart')))
+        self.timers[name] = timer
+        timer.step()
+        return {'ok': True, 'timer': timer.snapshot()}
+
+    def handle(self, client, request):
+        """Carry out one request; returns the reply, or None if the client is now attached"""
+        command = request.get('cmd')
+        if command == 'status':
+            return {'ok': True, 'timers': [timer.snapshot() for timer in self.timers.values()]}
+        if command == 'start':
+            return self.start(request)
+        if command == 'watch':
+            # Stream every timer's snapshots, for status bars
+            client.watching_all = True
+            for timer in self.timers.values():
+                client.send(timer.snapshot())
+            return None
+        timer = self.find(request.get('name') or client.attached)
+        if timer is None:
+            return {'ok': False, 'error': "No timer is running"}
+        if command == 'attach':
+            client.attached = timer.name
+            client.send(timer.snapshot())
+            return None
+        if command == 'pause':
+            timer.press()
+        elif command == 'autostart':
+            timer.toggle_autostart()
+        elif command == 'continue':
+            timer.answer_continue(request.get('answer'))
+        elif command == 'stop':
+            timer.stop()
+        else:
+            return {'ok': False, 'error': f"Unknown command: {command}"}
+        return {'ok': True, 'timer': timer.snapshot()}
+
+    def receive(self, client):
+        try:
+            data = client.sock.recv(65536)
+        except OSError:
+            data = b''
+        if not data:
+            client.closed = True
+            return
+        client.buffer += data
+        while b'\n' in client.buffer:
+            line, client.buffer = client.buffer.split(b'\n', 1)
+            try:
+                request = json.loads(line)
+                reply = self.handle(client, request)
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                reply = {'ok': False, 'error': f"Bad request: {e}"}
+            # Attached clients follow the snapshot stream instead of replies
+            if reply is not None and client.attached is None and not client.watching_all:
+                client.send(reply)
+
+    def serve(self):
+        watch_signals()
+        while True:
+            for timer in self.wakeups.pop_due(clock_now()):
+                timer.step()
+
+            next_wakeup = self.wakeups.next_deadline()
+            timeout = None
+            if next_wakeup is not None:
+                timeout = max(next_wakeup - clock_now(), 0.0)
+                if clock_id != time.CLOCK_MONOTONIC:
+                    timeout = min(timeout, DAEMON_MAX_SLEEP)
+            fds = [self.server, *self.clients]
+            if signal_wakeup_fd is not None:
+                fds.append(signal_wakeup_fd)
+            ready = select.select(fds, [], [], timeout)[0]
+            debug_stats['daemon_wakeups'] = debug_stats.get('daemon_wakeups', 0) + 1
+
+            if signal_wakeup_fd in ready:
+                try:
+                    os.read(signal_wakeup_fd, 512)
+                except BlockingIOError:
+                    pass
+            if children_exited:
+                reap_sounds()
+            for sock in ready:
+                if sock is self.server:
+                    conn, _ = self.server.accept()
+                    conn.settimeout(DAEMON_SEND_TIMEOUT)
+                    self.clients[conn] = DaemonClient(conn)
+                elif sock in self.clients:
+                    self.receive(self.clients[sock])
+            for sock, client in list(self.clients.items()):
+                if client.closed:
+                    sock.close()
+                    del self.clients[sock]
+
+def handle_terminate(signum, frame):
+    sys.exit(0)
+
+def run_daemon():
+    daemon = Daemon(daemon_socket_path())
+    daemon.listen()
+    signal.signal(signal.SIGTERM, handle_terminate)
+    # Probe helpers up front, so the first timer doesn't stall every client
+    get_capabilities()
+    print(f"{Colors.BOLD}{Colors.GREEN}pomotimer daemon listening on {daemon.path}{Colors.ENDC}", flush=True)
+    try:
+        daemon.serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.close()
+
+# --- Client ---
+# Banners printed by an attached client when a timer enters a phase
+PHASE_BANNERS = {
+    'work': ("--- Work Session {session} ---", Colors.GREEN),
+    'break': ("--- Break {session} ---", Colors.RED),
+    'countdown': ("--- Countdown Timer ---", Colors.GREEN),
+    'overdue': ("*** Timer Complete! ***", Colors.PURPLE),
+    'done': ("*** Pomodoro Complete! ***", Colors.PURPLE),
+    'stopped': ("Timer Cancelled.", Colors.RED),
+}
+
+def snapshot_times(timer, received, now):
+    """The remaining and overdue seconds of a snapshot received at clock time received, as of now"""
+    elapsed = now - received
+    remaining = timer['remaining'] if timer['paused'] else max(timer['remaining'] - elapsed, 0.0)
+    overdue = timer['overdue'] + elapsed if timer['phase'] in WAITING_PHASES else 0.0
+    return remaining, overdue
+
+def start_in_daemon(request, detach):
+    """Hand a timer to the daemon if one is running; returns False to run it in this terminal"""
+    reply = daemon_request(request)
+    if reply is None:
+        return False
+    if not reply.get('ok'):
+        print(f"{Colors.RED}Error: {reply.get('error')}{Colors.ENDC}")
+        sys.exit(1)
+    timer = reply['timer']
+    if detach:
+        print(describe_timer(timer))
+    else:
+        attach(timer['name'])
+    return True
+
+def print_banner(timer):
+    banner = PHASE_BANNERS.get(timer['phase'])
+    if banner is None or (timer['phase'] == 'done' and timer['kind'] != 'tpom'):
+        return
+    text, color = banner
+    print(f"\n{Colors.BOLD}{color}{text.format(session=timer['session'])}{Colors.ENDC}\n")
+
+def attach(name=None):
+    """
+    Follow a daemon timer in this terminal. The daemon only sends a snapshot when the
+    state changes; the seconds in between are rendered locally from it. P, A and y/n act
+    on the timer, Ctrl+C stops it and D detaches, leaving it running.
+    """
+    sock = daemon_connect()
+    if sock is None:
+        print(f"{Colors.YELLOW}No pomotimer daemon is running. Start one with: pomotimer daemon{Colors.ENDC}")
+        sys.exit(1)
+    sock.sendall(encode_message({'cmd': 'attach', 'name': name}))
+    try:
+        event_loop.run(attached_timer(sock))
+    except KeyboardInterrupt:
+        # Only reachable without a terminal; there Ctrl+C just detaches
+        print(f"\n{Colors.YELLOW}Detached, the timer keeps running in the daemon.{Colors.ENDC}")
+    finally:
+        sock.close()
+
+def attached_timer(sock):
+    """The screen coroutine of attach()"""
+    incoming = []
+
+    def receive():
+        try:
+            incoming.append(sock.recv(65536))
+        except OSError:
+            incoming.append(b'')
+
+    event_loop.add_reader(sock, receive)
+    interactive = event_loop.interactive
+    buffer = b''
+    timer = None
+    received = 0.0
+    prefix = ''
+    prefix_width = 0
+    timeout = None
+    try:
+        while True:
+            key = yield timeout
+
+            for data in incoming:
+                if not data:
+                    if timer is not None and timer['phase'] in COUNTING_PHASES:
+                        status_renderer.finish()
+                    print(f"\n{Colors.YELLOW}Lost connection to the pomotimer daemon.{Colors.ENDC}")
+                    return
+                buffer += data
+            incoming.clear()
+            while b'\n' in buffer:
+                line, buffer = buffer.split(b'\n', 1)
+                message = json.loads(line)
+                if 'phase' not in message:
+                    print(f"{Colors.RED}Error: {message.get('error')}{Colors.ENDC}")
+                    return
+                previous, timer = timer, message
+                received = clock_now()
+                if previous is not None and (previous['phase'], previous['session']) == (timer['phase'], timer['session']):
+                    continue
+                # Entering a new phase: close the old screen and open the new one
+                if previous is not None and previous['phase'] in COUNTING_PHASES:
+                    status_renderer.finish()
+                if previous is not None:
+                    print()
+                print_banner(timer)
+                if timer['phase'] in FINAL_PHASES:
+                    return
+                if timer['phase'] in COUNTING_PHASES and interactive:
+                    sys.stdout.write('\n\x1b[s')
+                    sys.stdout.flush()
+                    status_renderer.invalidate()
+                elif timer['phase'] in WAITING_PHASES:
+                    prefix = WAIT_MESSAGES[timer['phase']].format(session=timer['session']) + ' '
+                    prefix_width = get_visual_length(prefix)
+                elif timer['phase'] == 'ask-continue':
+                    print("  All work sessions complete. Add another run? y/n: ", end='', flush=True)
+
+            if timer is not None and key is not None:
+                key = key.lower()
+                if key == '\x03':
+                    sock.sendall(encode_message({'cmd': 'stop'}))
+                elif key == 'd':
+                    if timer['phase'] in COUNTING_PHASES:
+                        status_renderer.finish()
+                    print(f"\n{Colors.YELLOW}Detached, the timer keeps running in the daemon.{Colors.ENDC}")
+                    return
+                elif timer['phase'] == 'ask-continue':
+                    if key in ('y', 'n'):
+                        print(key)
+                        sock.sendall(encode_message({'cmd': 'continue', 'answer': key == 'y'}))
+                # Check for 'p' in English and other layouts (e.g., 'з' in Russian)
+                elif key in ('p', 'з'):
+                    sock.sendall(encode_message({'cmd': 'pause'}))
+                elif key == 'a' and timer['kind'] == 'tpom':
+                    sock.sendall(encode_message({'cmd': 'autostart'}))
+
+            # Render the current second from the last snapshot
+            timeout = None
+            if timer is None or not interactive:
+                continue
+            remaining, overdue = snapshot_times(timer, received, clock_now())
+            if timer['phase'] in COUNTING_PHASES:
+                message = PAUSED_MESSAGE if timer['paused'] else RUNNING_MESSAGE
+                autostart = timer['autostart'] if timer['kind'] == 'tpom' else None
+                display_time(timer['total'], math.ceil(remaining), message, autostart, use_cursor_saving=True)
+                if not timer['paused'] and remaining > 0:
+                    timeout = next_tick_timeout(remaining)
+            elif timer['phase'] in WAITING_PHASES:
+                display_overdue(prefix, prefix_width, overdue)
+                timeout = next_tick_timeout(-overdue)
+    finally:
+        event_loop.remove_reader(sock)
+
+# --- Waybar ---
+# How often the waybar module looks for the daemon while none is running
+WAYBAR_RETRY = 10.0
+WAYBAR_LABELS = {
+    'work': "Work",
+    'break': "Break",
+    'countdown': "Countdown",
+    'break-wait': "Break overdue",
+    'work-wait': "Work overdue",
+    'overdue': "Overdue",
+    'ask-continue': "Sessions complete",
+}
+
+def waybar_texts(timer, remaining, overdue):
+    """A timer's label (phase and session) and its remaining or overdue time, if any"""
+    label = WAYBAR_LABELS.get(timer['phase'], timer['phase'])
+    if timer['kind'] == 'tpom':
+        label += f" {timer['session']}/{timer['sessions']}"
+    if timer['phase'] in COUNTING_PHASES:
+        return label, format_clock(math.ceil(remaining))
+    if timer['phase'] in WAITING_PHASES:
+        return label, '+' + format_clock(int(overdue))
+    return label, ''
+
+def waybar_status(timers, now):
+    """
+    The module's JSON object for the timers being watched (name -> (snapshot, received)),
+    and the seconds until its text changes next, or None if only a snapshot can change it.
+    The most recently started timer is shown, all of them are listed in the tooltip.
+    """
+    if not timers:
+        return {'text': '', 'tooltip': '', 'class': 'idle', 'percentage': 0}, None
+    tooltip = []
+    for timer, received in timers.values():
+        label, time_text = waybar_texts(timer, *snapshot_times(timer, received, now))
+        tooltip.append(f"{timer['name']}: {label} {time_text}".rstrip() + (" (paused)" if timer['paused'] else ""))
+
+    # timers is in start order, so the last one is the most recently started
+    shown, received = next(reversed(timers.values()))
+    remaining, overdue = snapshot_times(shown, received, now)
+    label, time_text = waybar_texts(shown, remaining, overdue)
+    classes = [shown['phase']] + (['paused'] if shown['paused'] else [])
+    percentage = 100
+    timeout = None
+    if shown['phase'] in COUNTING_PHASES:
+        percentage = int((shown['total'] - math.ceil(remaining)) / shown['total'] * 100) if shown['total'] > 0 else 0
+        if not shown['paused'] and remaining > 0:
+            timeout = next_tick_timeout(remaining)
+    elif shown['phase'] in WAITING_PHASES:
+        timeout = next_tick_timeout(-overdue)
+    status = {'text': time_text or label, 'tooltip': '\n'.join(tooltip), 'class': classes, 'percentage': percentage}
+    return status, timeout
+
+def emit_waybar(status, last_line):
+    """Print the status if it differs from the last line printed; returns the current line"""
+    line = json.dumps(status, ensure_ascii=False)
+    if line != last_line:
+        sys.stdout.write(line + '\n')
+        sys.stdout.flush()
+        debug_stats['waybar_lines'] = debug_stats.get('waybar_lines', 0) + 1
+    return line
+
+def run_waybar():
+    """
+    Run as a waybar custom module. Timer state is pushed by the daemon, so the module
+    only wakes up for a snapshot or when the shown time changes, and prints a line
+    only if the output is different.
+    """
+    last_line = None
+    try:
+        while True:
+            sock = daemon_connect()
+            if sock is None:
+                last_line = emit_waybar({'text': '', 'tooltip': "pomotimer daemon not running", 'class': 'offline', 'percentage': 0}, last_line)
+                time.sleep(WAYBAR_RETRY)
+                continue
+            with sock:
+                sock.sendall(encode_message({'cmd': 'watch'}))
+                timers = {}
+                buffer = b''
+                while True:
+                    status, timeout = waybar_status(timers, clock_now())
+                    last_line = emit_waybar(status, last_line)
+                    ready = select.select([sock], [], [], timeout)[0]
+                    debug_stats['waybar_wakeups'] = debug_stats.get('waybar_wakeups', 0) + 1
+                    if not ready:
+                        continue
+                    data = sock.recv(65536)
+                    if not data:
+                        break
+                    buffer += data
+                    while b'\n' in buffer:
+                        line, buffer = buffer.split(b'\n', 1)
+                        timer = json.loads(line)
+                        if timer['phase'] in FINAL_PHASES:
+                            timers.pop(timer['name'], None)
+                        else:
+                            timers[timer['name']] = (timer, clock_now())
+    except KeyboardInterrupt:
+        pass
+    except BrokenPipeError:
+        # waybar went away; keep the interpreter from complaining about stdout on exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+def add_countdown_arguments(parser):
+    parser.add_argument("time", type=str, help="The time to count down (e.g., 5 or 5m for 5 minutes, 30s for 30 seconds).")
+
+def add_pomodoro_arguments(parser):
+    parser.add_argument("work", type=str, help="Work session length (e.g., 25 or 25m, 1500s).")
+    parser.add_argument("break_time", type=str, help="Break session length (e.g., 5 or 5m, 300s).")
+    parser.add_argument("sessions", type=int, help="Number of work sessions.")
+    parser.add_argument("autostart", type=str, nargs='?', default=None, help="Optional: type 'a' to autostart next session without confirmation.")
+
+def add_simulation_arguments(parser):
+    parser.add_argument("--keys", default=None, help="Keys to press, as KEY@TIME items or a file of them (e.g., p@25m,p@31m,^C@120m).")
+    parser.add_argument("--limit", default=None, help="Virtual time after which the run is cut off (default: 1440m, a day).")
+    parser.add_argument("--runs", type=int, default=0, help="Benchmark: run the simulation this many times in worker processes and report throughput.")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes for --runs (default: one per CPU).")
+
+def check_autostart(args, parser):
+    """Exit with usage help if the tpom autostart parameter isn't 'a'; returns whether autostart is on"""
+    if args.autostart is not None and args.autostart != '' and args.autostart != 'a':
+        print(f"{Colors.RED}Error: Invalid autostart parameter '{args.autostart}'.{Colors.ENDC}")
+        print()
+        parser.print_help(sys.stderr)
+        print()
+        print(f"{Colors.YELLOW}Usage example:{Colors.ENDC}")
+        print(f"  {Colors.BOLD}python pomotimer.py tpom 25 5 4{Colors.ENDC}    # Regular pomodoro")
+        print(f"  {Colors.BOLD}python pomotimer.py tpom 25 5 4 a{Colors.ENDC}  # Autostart enabled")
+        print()
+        sys.exit(1)
+
+    # Treat empty string as None (no autostart)
+    return args.autostart == 'a'
+
+def main():
+    parser = argparse.ArgumentParser(description="A stylish terminal timer script.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    parser_countdown = subparsers.add_parser("tcount", help="A simple countdown timer.")
+    add_countdown_arguments(parser_countdown)
+
+    parser_pomodoro = subparsers.add_parser("tpom", help="A Pomodoro timer.")
+    add_pomodoro_arguments(parser_pomodoro)
+
+    # With a daemon running, tcount and tpom hand the timer over to it
+    for timer_parser in (parser_countdown, parser_pomodoro):
+        timer_parser.add_argument("--detach", action="store_true", help="Start the timer in the daemon and return right away.")
+        timer_parser.add_argument("--name", default=None, help="Name the timer, so the daemon can run several of the same kind.")
+
+    parser_multi = subparsers.add_parser("multi", help="Several named countdowns in one terminal.")
+    parser_multi.add_argument("timers", nargs='+', help="NAME=TIME for each timer (e.g., laundry=45m build=10m).")
+
+    parser_simulate = subparsers.add_parser("simulate", help="Run a timer on a virtual clock and print what it would do as JSON lines.")
+    simulated = parser_simulate.add_subparsers(dest="simulated", required=True)
+    simulated_parsers = {'tcount': simulated.add_parser("tcount", help="Simulate a countdown timer."),
+                         'tpom': simulated.add_parser("tpom", help="Simulate a Pomodoro timer.")}
+    add_countdown_arguments(simulated_parsers['tcount'])
+    add_pomodoro_arguments(simulated_parsers['tpom'])
+    for simulated_parser in simulated_parsers.values():
+        add_simulation_arguments(simulated_parser)
+
+    parser_stats = subparsers.add_parser("stats", help="Show focus time, sessions, break overdue and streaks from the history.")
+    period = parser_stats.add_mutually_exclusive_group()
+    period.add_argument("--day", dest="period", action="store_const", const="day", help="Today (the default).")
+    period.add_argument("--week", dest="period", action="store_const", const="week", help="The last 7 days.")
+    period.add_argument("--range", default=None, metavar="FROM[:TO]", help="From one date to another, inclusive (e.g., 2025-01-01:2025-12-31); TO defaults to today.")
+    subparsers.add_parser("resume", help="Continue a tpom run that was interrupted, e.g. by closing its terminal.")
+    subparsers.add_parser("daemon", help="Run the timer daemon, which owns timers started while it runs.")
+    parser_status = subparsers.add_parser("status", help="Show the timers running in the daemon.")
+    parser_status.add_argument("--format", default=None,
+                               help="Print the running timer from the status file instead, e.g. '{phase} {remaining}'. "
+                                    "Fields: phase, kind, session, sessions, remaining, overdue, percentage, paused, autostart.")
+    subparsers.add_parser("waybar", help="Run as a waybar custom module, printing the daemon's timer as JSON.")
+    for command, help_text in (("pause", "Pause/resume a daemon timer, or end its overdue wait (the P key)."),
+                               ("stop", "Stop a daemon timer."),
+                               ("attach", "Show a daemon timer in this terminal.")):
+        parser_client = subparsers.add_parser(command, help=help_text)
+        parser_client.add_argument("name", nargs='?', default=None, help="Timer name (default: the most recently started one).")
+
+    if len(sys.argv) < 2:
+        parser.print_help(sys.stderr)
+        sys.exit(1)
+
+    args = parser.parse_args()
+
+    if args.command == "daemon":
+        run_daemon()
+    elif args.command == "status" and args.format is not None:
+        run_status_format(args.format)
+    elif args.command in ("status", "pause", "stop"):
+        run_client_command(args.command, getattr(args, 'name', None))
+    elif args.command == "attach":
+        attach(args.name)
+    elif args.command == "waybar":
+        run_waybar()
+    elif args.command == "multi":
+        report_missing_helpers()
+        run_multi(args.timers)
+    elif args.command == "resume":
+        report_missing_helpers()
+        run_resume()
+    elif args.command == "stats":
+        run_stats(args.period or 'day', args.range)
+    elif args.command == "simulate":
+        keys = parse_key_script(args.keys)
+        limit = parse_time(args.limit) if args.limit else SIMULATION_LIMIT
+        timer_args = {name: getattr(args, name) for name in ('time', 'work', 'break_time', 'sessions') if hasattr(args, name)}
+        if args.simulated == 'tpom':
+            timer_args['autostart'] = check_autostart(args, simulated_parsers['tpom'])
+        if args.runs > 0:
+            run_simulations(args.simulated, timer_args, keys, limit, args.runs, args.jobs)
+        else:
+            run_simulation(args.simulated, timer_args, keys, limit)
+    elif args.command == "tcount":
+        request = {'cmd': 'start', 'kind': 'tcount', 'name': args.name, 'time': int(parse_time(args.time))}
+        if not start_in_daemon(request, args.detach):
+            # Probe helpers before the timer starts, not on its first notification
+            report_missing_helpers()
+            run_countdown(args.time)
+    elif args.command == "tpom":
+        autostart = check_autostart(args, parser_pomodoro)
+        request = {'cmd': 'start', 'kind': 'tpom', 'name': args.name, 'work': int(parse_time(args.work)), 'break': int(parse_time(args.break_time)),
+                   'sessions': args.sessions, 'autostart': autostart}
+        if not start_in_daemon(request, args.detach):
+            report_missing_helpers()
+            run_pomodoro(args.work, args.break_time, args.sessions, autostart)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Measure what drawing a countdown frame costs, before and after frame templates:
+    python3 tests/bench_frames.py [frames]
+"before" rebuilds the whole line with f-strings and measures its static fragments on
+every tick, as display_time() did until frames were compiled into templates. "after"
+is display_time() itself. Both write to a sink that discards the frame.
+Per frame, "peak B" is the most memory held at once beyond what was live before the
+frame (tracemalloc), "kept B" what it still holds afterwards.
+"""
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pomotimer_core import (BAR_GLYPH, RUNNING_MESSAGE, Colors, display_time, get_visual_length, layout,
+                            truncate_visual)
+
+TOTAL = 25 * 60
+
+class Sink:
+    def write(self, text):
+        pass
+
+    def flush(self):
+        pass
+
+def display_time_before(initial_total, remaining_seconds, message="", autostart=None):
+    """display_time() as it was before frame templates, for comparison"""
+    mins, secs = divmod(remaining_seconds, 60)
+    time_str = f"{mins:02d}:{secs:02d}"
+
+    autostart_str = ""
+    if autostart is not None:
+        status = f"{Colors.GREEN}ON{Colors.ENDC}" if autostart else f"{Colors.RED}OFF{Colors.ENDC}"
+        autostart_str = f" | Auto:{status}"
+
+    visual_length = len(time_str) + 1 + get_visual_length(message) + get_visual_length(autostart_str)
+    if initial_total > 0:
+        progress = int(((initial_total - remaining_seconds) / initial_total) * 100)
+        width = layout.bar_width(visual_length + 8)
+        filled = int((progress / 100.0) * width)
+        bar = BAR_GLYPH * filled + ' ' * (width - filled)
+        full_str = f"{Colors.BOLD}{Colors.YELLOW}{time_str}{Colors.ENDC} [{bar}] {progress}% {message}{autostart_str}"
+        visual_length += filled * get_visual_length(BAR_GLYPH) + (width - filled) + len(str(progress)) + 5
+    else:
+        full_str = f"{Colors.BOLD}{Colors.YELLOW}{time_str}{Colors.ENDC} {message}{autostart_str}"
+
+    if visual_length > layout.columns:
+        full_str = truncate_visual(full_str, layout.columns)
+    sys.stdout.write(f'\x1b[2K{full_str}\r')
+    sys.stdout.flush()
+
+def run_frames(draw, frames):
+    for remaining in range(frames, 0, -1):
+        draw(TOTAL, remaining % TOTAL, RUNNING_MESSAGE, True)
+
+def allocations(draw, frames):
+    """Mean peak and kept bytes per frame"""
+    run_frames(draw, 10)  # warm the caches, as the first ticks of a countdown do
+    peak_total = kept_total = 0
+    tracemalloc.start()
+    for remaining in range(frames, 0, -1):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        draw(TOTAL, remaining % TOTAL, RUNNING_MESSAGE, True)
+        after, peak = tracemalloc.get_traced_memory()
+        peak_total += peak - before
+        kept_total += after - before
+    tracemalloc.stop()
+    return peak_total / frames, kept_total / frames
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else TOTAL
+    layout.resized = False
+    layout.columns, layout.rows = 120, 40
+    sys.stdout, stdout = Sink(), sys.stdout
+    try:
+        results = []
+        for name, draw in (('before', display_time_before), ('after', display_time)):
+            peak, kept = allocations(draw, frames)
+            seconds = min(timeit.repeat(lambda: run_frames(draw, frames), number=1, repeat=5)) / frames
+            results.append((name, peak, kept, seconds))
+    finally:
+        sys.stdout = stdout
+    print(f"{'':>6} {'peak B':>8} {'kept B':>8} {'us':>7}")
+    for name, peak, kept, seconds in results:
+        print(f"{name:>6} {peak:>8.0f} {kept:>8.1f} {seconds * 1e6:>7.2f}")
+
+if __name__ == "__main__":
+    main()
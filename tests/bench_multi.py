@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Run multi_timers() with 10 to 1,000 timers of 1-30 s on the virtual clock and report
+its wakeups, renders and CPU time:
+    python3 tests/bench_multi.py [timers ...]
+For comparison, one tcount process per timer wakes once a second until it finishes.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pomotimer_core
+from pomotimer_core import multi_timers, simulate
+
+def run(count, rng):
+    specs = [(f"timer {number}", rng.randint(1, 30)) for number in range(1, count + 1)]
+    longest = max(seconds for _, seconds in specs)
+    pomotimer_core.debug_stats.clear()
+    started = time.process_time()
+    # P once the last one is done clears them all and ends the run
+    trace = simulate(multi_timers(specs), [(longest + 1, 'p')])
+    cpu = time.process_time() - started
+    assert trace[-1] == {'t': longest + 1, 'event': 'end', 'reason': 'finished'}, trace[-1]
+    renders = sum(1 for event in trace if event['event'] == 'render')
+    return pomotimer_core.debug_stats['multi_wakeups'], renders, sum(seconds for _, seconds in specs), cpu
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [10, 100, 1000]
+    rng = random.Random(0)
+    print(f"{'timers':>6} {'wakeups':>8} {'renders':>8} {'per-process':>12} {'cpu ms':>8}")
+    for count in counts:
+        wakeups, renders, separate, cpu = run(count, rng)
+        print(f"{count:>6} {wakeups:>8} {renders:>8} {separate:>12} {cpu * 1000:>8.1f}")
+
+if __name__ == "__main__":
+    main()
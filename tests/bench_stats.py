@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Build a synthetic history and time the stats queries on it:
+    python3 tests/bench_stats.py [sessions] [directory]
+Each session is a work phase, a break-wait and a break, ten sessions a day, so the
+default 1,000,000 sessions (about 300 MB) span 100,000 days. The history is written to
+a temporary directory unless one is given, and kept there for reruns.
+"""
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pomotimer_core import Rollups, day_number, longest_streak
+
+SESSIONS_PER_DAY = 10
+# Where the synthetic history starts, at noon
+START = 1760097600 - 100_000 * 86400
+
+def write_history(path, sessions, rng):
+    with open(path, 'w') as f:
+        for number in range(sessions):
+            day, slot = divmod(number, SESSIONS_PER_DAY)
+            ts = START + day * 86400 + slot * 1800
+            overdue = rng.randint(0, 300)
+            lines = [
+                {'ts': ts, 'kind': 'tpom', 'phase': 'work', 'planned': 1500, 'actual': 1500.0, 'overdue': 0,
+                 'pauses': rng.randint(0, 2)},
+                {'ts': ts + 1500, 'kind': 'tpom', 'phase': 'break-wait', 'planned': 0, 'actual': float(overdue),
+                 'overdue': float(overdue), 'pauses': 0},
+                {'ts': ts + 1500 + overdue, 'kind': 'tpom', 'phase': 'break', 'planned': 300, 'actual': 300.0,
+                 'overdue': 0, 'pauses': 0},
+            ]
+            f.write(''.join(json.dumps(line, separators=(',', ':')) + '\n' for line in lines))
+
+def yearly_summary(rollups, today):
+    """What run_stats does for a year: refresh, query and both streaks"""
+    rollups.refresh()
+    records = rollups.query(today - 364, today)
+    totals = [sum(record[i] for record in records) for i in (1, 2, 3, 4)]
+    return totals, rollups.streak(today), longest_streak(records)
+
+def timed(func, *args, repeat=50):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1000
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    directory = sys.argv[2] if len(sys.argv) > 2 else tempfile.mkdtemp(prefix='pomotimer-bench-')
+    os.makedirs(directory, exist_ok=True)
+    history = os.path.join(directory, f'history-{sessions}.jsonl')
+    days_path = os.path.join(directory, f'history-{sessions}.days')
+    if not os.path.exists(history):
+        started = time.perf_counter()
+        write_history(history, sessions, random.Random(0))
+        print(f"history: {sessions} sessions, {os.path.getsize(history) / 1e6:.0f} MB, written in {time.perf_counter() - started:.1f} s")
+    last_day = day_number(START) + (sessions - 1) // SESSIONS_PER_DAY
+    if os.path.exists(days_path):
+        os.unlink(days_path)
+    rollups = Rollups(days_path, history)
+
+    started = time.perf_counter()
+    rollups.refresh()
+    print(f"rollup build:        {time.perf_counter() - started:8.2f} s")
+    summary = timed(yearly_summary, rollups, last_day)
+    print(f"yearly summary:      {summary:8.2f} ms (median; target 50 ms)")
+
+    def append_and_refresh():
+        with open(history, 'a') as f:
+            f.write(json.dumps({'ts': START + (last_day - day_number(START)) * 86400 + 3600, 'kind': 'tpom',
+                                'phase': 'work', 'planned': 1500, 'actual': 1500.0, 'overdue': 0, 'pauses': 0}) + '\n')
+        rollups.refresh()
+    print(f"append and refresh:  {timed(append_and_refresh, repeat=20):8.2f} ms (median)")
+    print(f"(files kept in {directory})")
+    sys.exit(0 if summary < 50 else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Time reads of the status record, as a status bar polling it would do them:
+    python3 tests/bench_status.py [seconds]
+"mapped" reuses one StatusReader, "one-off" opens and maps the file for every read
+with read_status(), like `pomotimer status --format` does once per run.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pomotimer_client import StatusReader, read_status
+from pomotimer_core import StatusFile
+
+def reads_per_second(read, seconds):
+    reads = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(1000):
+            read()
+        reads += 1000
+    return reads / (time.perf_counter() - start)
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    with tempfile.TemporaryDirectory() as directory:
+        status = StatusFile(os.path.join(directory, 'runtime', 'pomotimer.status'))
+        status.update(phase='work', kind='tpom', session=2, sessions=4, total=1500)
+        reader = StatusReader(status.path)
+        assert reader.read()['phase'] == 'work'
+        try:
+            for name, read in (('mapped', reader.read), ('one-off', lambda: read_status(status.path))):
+                rate = reads_per_second(read, seconds)
+                print(f"{name:>8}: {rate:>10,.0f} reads/s {1e6 / rate:>7.2f} us/read")
+        finally:
+            reader.close()
+            status.clear()
+
+if __name__ == "__main__":
+    main()
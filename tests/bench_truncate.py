@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Time truncate_visual() on styled status lines of 10 to 500 columns:
+    python3 tests/bench_truncate.py [repeat]
+Each line is cut to half its width, as display_time() does in a narrow terminal.
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pomotimer_core import Colors, truncate_visual
+
+def styled_line(width):
+    # Colored runs of ten cells, like the progress bar and the session label
+    runs = [f"{Colors.BOLD}{Colors.GREEN}{'▌' * 2}{Colors.ENDC}x 12:34 " for _ in range(width // 10)]
+    return ''.join(runs) + 'x' * (width % 10)
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    print(f"{'width':>6} {'fits us':>9} {'cut us':>9}")
+    for width in (10, 20, 50, 100, 200, 500):
+        line = styled_line(width)
+        fits = min(timeit.repeat(lambda: truncate_visual(line, width), number=repeat, repeat=3)) / repeat
+        cut = min(timeit.repeat(lambda: truncate_visual(line, width // 2), number=repeat, repeat=3)) / repeat
+        print(f"{width:>6} {fits * 1e6:>9.2f} {cut * 1e6:>9.2f}")
+
+if __name__ == "__main__":
+    main()
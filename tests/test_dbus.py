@@ -0,0 +1,196 @@
+import os
+import shutil
+import socket
+import struct
+import subprocess
+import threading
+import time
+
+import pytest
+
+import pomotimer_core
+from pomotimer_core import (DBUS_ERROR, DBUS_METHOD_CALL, DBUS_METHOD_RETURN, DBusConnection, DBusError,
+                            DBusWriter, bus_notify, close_with_dbus, dbus_split_signature, send_notification)
+
+pytestmark = pytest.mark.skipif(shutil.which('dbus-daemon') is None, reason="needs dbus-daemon")
+
+class StubNotifications:
+    """org.freedesktop.Notifications on its own connection, recording the calls it gets"""
+
+    def __init__(self, address):
+        self.conn = DBusConnection(address).connect()
+        self.conn.call('org.freedesktop.DBus', '/org/freedesktop/DBus', 'org.freedesktop.DBus',
+                       'RequestName', 'su', ['org.freedesktop.Notifications', 0])
+        self.notified = []
+        self.closed = []
+        self.open_ids = set()
+        self.next_id = 1
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.conn.close()
+
+    def serve(self):
+        self.conn.sock.settimeout(0.05)
+        while not self.stopped.is_set():
+            try:
+                while len(self.conn.buffer) < 16:
+                    self.conn.receive()
+                serial = struct.unpack_from('<I', self.conn.buffer, 8)[0]
+                msg_type, fields, body = self.conn.read_message()
+            except socket.timeout:
+                continue
+            if msg_type == DBUS_METHOD_CALL:
+                self.handle(serial, fields, body)
+
+    def handle(self, serial, fields, body):
+        if fields.get('member') == 'Notify':
+            self.notified.append(body)
+            replaces_id = body[1]
+            if not replaces_id:
+                replaces_id, self.next_id = self.next_id, self.next_id + 1
+            self.open_ids.add(replaces_id)
+            self.reply(serial, fields, 'u', [replaces_id])
+        elif fields.get('member') == 'CloseNotification':
+            self.closed.append(body[0])
+            if body[0] in self.open_ids:
+                self.open_ids.discard(body[0])
+                self.reply(serial, fields)
+            else:
+                self.reply(serial, fields, 's', ["Unknown notification"],
+                           error='org.freedesktop.Notifications.Error.NotFound')
+        else:
+            self.reply(serial, fields, 's', ["Unknown method"], error='org.freedesktop.DBus.Error.UnknownMethod')
+
+    def reply(self, serial, fields, signature='', args=(), error=None):
+        self.conn.serial += 1
+        body = DBusWriter()
+        for sigtype, value in zip(dbus_split_signature(signature), args):
+            body.write(sigtype, value)
+        header_fields = [(5, ('u', serial)), (6, ('s', fields['sender']))]
+        if error:
+            header_fields.append((4, ('s', error)))
+        if signature:
+            header_fields.append((8, ('g', signature)))
+        header = DBusWriter()
+        header.buf += bytes([ord('l'), DBUS_ERROR if error else DBUS_METHOD_RETURN, 0, 1])
+        header.buf += struct.pack('<II', len(body.buf), self.conn.serial)
+        header.write('a(yv)', header_fields)
+        header.align(8)
+        self.conn.sock.sendall(bytes(header.buf + body.buf))
+
+class CountingSocket:
+    """Wraps the bus socket to count writes"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.writes = 0
+
+    def sendall(self, data):
+        self.writes += 1
+        return self.sock.sendall(data)
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+@pytest.fixture
+def bus(tmp_path, monkeypatch):
+    """A private session bus, with the notification worker's state reset around the test"""
+    path = tmp_path / 'bus'
+    daemon = subprocess.Popen(['dbus-daemon', '--session', '--nofork', f'--address=unix:path={path}'],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while not path.exists():
+        assert time.monotonic() < deadline, "dbus-daemon didn't start"
+        time.sleep(0.01)
+    monkeypatch.setenv('DBUS_SESSION_BUS_ADDRESS', f'unix:path={path}')
+    monkeypatch.setattr(pomotimer_core, 'notification_bus', None)
+    monkeypatch.setattr(pomotimer_core, 'notification_bus_failed', False)
+    monkeypatch.setattr(pomotimer_core, 'notification_slots', {})
+    monkeypatch.setattr(pomotimer_core, 'tracked_notification_ids', {})
+    yield (str(path), False)
+    if pomotimer_core.notification_bus is not None:
+        pomotimer_core.notification_bus.close()
+    daemon.terminate()
+    daemon.wait()
+
+@pytest.fixture
+def stub(bus):
+    stub = StubNotifications(bus)
+    yield stub
+    stub.stop()
+
+def test_connection_says_hello(bus):
+    conn = DBusConnection(bus).connect()
+    assert conn.unique_name.startswith(':')
+    (names,) = conn.call('org.freedesktop.DBus', '/org/freedesktop/DBus', 'org.freedesktop.DBus', 'ListNames')
+    assert 'org.freedesktop.DBus' in names
+    conn.close()
+
+def test_call_many_returns_results_and_errors_in_order(bus):
+    conn = DBusConnection(bus).connect()
+    results = conn.call_many('org.freedesktop.DBus', '/org/freedesktop/DBus', 'org.freedesktop.DBus',
+                             'NameHasOwner', 's', [['org.freedesktop.DBus'], ['org.example.Nobody']])
+    assert results == [[True], [False]]
+    results = conn.call_many('org.freedesktop.DBus', '/org/freedesktop/DBus', 'org.freedesktop.DBus',
+                             'GetNameOwner', 's', [['org.freedesktop.DBus'], ['org.example.Nobody']])
+    assert results[0] == ['org.freedesktop.DBus']
+    assert isinstance(results[1], DBusError) and results[1].name == 'org.freedesktop.DBus.Error.NameHasNoOwner'
+    conn.close()
+
+def test_unowned_service_is_an_error(bus):
+    conn = DBusConnection(bus).connect()
+    with pytest.raises(DBusError) as error:
+        conn.call(*pomotimer_core.DBUS_NOTIFICATIONS, 'GetServerInformation')
+    assert error.value.name == 'org.freedesktop.DBus.Error.ServiceUnknown'
+    conn.close()
+
+def test_notify_ids_and_replaces_id(stub):
+    assert bus_notify("first") == 1
+    assert bus_notify("second", 'critical', None) == 2
+    assert bus_notify("first again", replaces_id=1) == 1
+    assert [body[1] for body in stub.notified] == [0, 0, 1]
+    assert [body[3] for body in stub.notified] == ["first", "second", "first again"]
+    assert stub.notified[1][6] == {'urgency': 2} and stub.notified[1][7] == -1
+    assert stub.notified[0][7] == -1 and stub.notified[0][6] == {}
+
+def test_slot_notifications_update_in_place(stub):
+    send_notification("Timer overdue by 1 minutes", 'critical', None, False, 'overdue')
+    send_notification("Timer overdue by 2 minutes", 'critical', None, False, 'overdue')
+    send_notification("Work session 1 complete")
+    assert [body[1] for body in stub.notified] == [0, 1, 0]
+    assert pomotimer_core.notification_slots == {'overdue': 1}
+    assert pomotimer_core.tracked_notification_ids == {None: {1, 2}}
+
+def test_close_notifications_in_one_write(stub):
+    ids = [bus_notify(f"cue {i}") for i in range(5)]
+    bus = pomotimer_core.notification_bus
+    bus.sock = CountingSocket(bus.sock)
+    # One of them was already closed, e.g. by the user; its error doesn't fail the batch
+    assert close_with_dbus(ids + [99])
+    assert bus.sock.writes == 1
+    assert sorted(stub.closed) == ids + [99]
+    assert not stub.open_ids
+
+def test_falls_back_to_notify_send_after_a_dbus_error(bus, tmp_path, monkeypatch):
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    fake = bin_dir / 'notify-send'
+    fake.write_text('#!/bin/sh\ncase "$*" in *--help*) echo "--print-id"; exit 0;; esac\n'
+                    f'echo "$*" >> {tmp_path}/notify-send.log\necho 7\n')
+    fake.chmod(0o755)
+    monkeypatch.setenv('PATH', f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.setattr(pomotimer_core, 'capabilities', None)
+
+    # Nobody owns org.freedesktop.Notifications on this bus
+    assert bus_notify("lost") is None
+    assert pomotimer_core.notification_bus is None
+    assert pomotimer_core.notification_bus_failed
+    send_notification("Timer Complete!", slot='overdue')
+    assert 'Timer Complete!' in (tmp_path / 'notify-send.log').read_text()
+    assert pomotimer_core.notification_slots == {'overdue': 7}
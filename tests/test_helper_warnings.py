@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pomotimer.py')
+PLAYER_WARNING = b'Warning: mpg123 not found'
+NOTIFY_NOTE = b'Note: notify-send not found'
+
+def test_missing_helpers_are_reported_before_the_first_frame(tmp_path):
+    runtime = tmp_path / 'runtime'
+    runtime.mkdir(mode=0o700)
+    empty_bin = tmp_path / 'bin'
+    empty_bin.mkdir()
+    env = dict(os.environ, PATH=str(empty_bin), XDG_RUNTIME_DIR=str(runtime), XDG_STATE_HOME=str(tmp_path / 'state'),
+               XDG_CACHE_HOME=str(tmp_path / 'cache'), POMOTIMER_PLAYER='pomotimer-test-no-player')
+    env.pop('DBUS_SESSION_BUS_ADDRESS', None)
+    # A work session that ends with a notification and a sound, while the break is drawn
+    result = subprocess.run([sys.executable, SCRIPT, 'tpom', '1s', '1s', '1'], env=env, stdin=subprocess.DEVNULL,
+                            capture_output=True, timeout=60)
+    assert result.returncode == 0
+    first_frame = result.stdout.index(b'\x1b[2K')
+    for warning in (PLAYER_WARNING, NOTIFY_NOTE):
+        assert result.stdout.count(warning) == 1
+        assert result.stdout.index(warning) < first_frame
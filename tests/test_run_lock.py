@@ -0,0 +1,47 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from pomotimer_core import RunLock
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pomotimer.py')
+
+def test_second_holder_is_refused(tmp_path):
+    first = RunLock(str(tmp_path / 'state' / 'lock'))
+    second = RunLock(first.path)
+    assert first.acquire()
+    assert not second.acquire()
+    assert second.holder() == os.getpid()
+    os.close(first.fd)
+    assert second.acquire()
+
+def test_second_run_leaves_the_first_ones_checkpoint_alone(tmp_path):
+    runtime = tmp_path / 'runtime'
+    runtime.mkdir(mode=0o700)
+    state = tmp_path / 'state'
+    env = dict(os.environ, XDG_RUNTIME_DIR=str(runtime), XDG_STATE_HOME=str(state),
+               XDG_CACHE_HOME=str(tmp_path / 'cache'), POMOTIMER_PLAYER='pomotimer-test-no-player',
+               PATH=os.path.dirname(sys.executable))
+    env.pop('DBUS_SESSION_BUS_ADDRESS', None)
+    first = subprocess.Popen([sys.executable, SCRIPT, 'tpom', '10m', '5m', '2'], env=env,
+                             stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    checkpoint = state / 'pomotimer' / 'checkpoint'
+    try:
+        deadline = time.monotonic() + 30
+        while not checkpoint.exists():
+            assert first.poll() is None and time.monotonic() < deadline
+            time.sleep(0.05)
+        saved = checkpoint.read_bytes()
+
+        for args in (['tpom', '1m', '1m', '1'], ['tcount', '1m'], ['resume']):
+            second = subprocess.run([sys.executable, SCRIPT, *args], env=env, stdin=subprocess.DEVNULL,
+                                    capture_output=True, text=True, timeout=60)
+            assert second.returncode == 1
+            assert f"Another pomotimer (pid {first.pid})" in second.stdout
+        assert checkpoint.read_bytes() == saved
+        assert first.poll() is None
+    finally:
+        first.send_signal(signal.SIGINT)
+        first.wait(timeout=30)
@@ -0,0 +1,48 @@
+import os
+import socket
+
+import pytest
+
+import pomotimer_client
+from pomotimer_client import daemon_connect, ensure_private_dir
+
+def test_creates_a_private_directory(tmp_path):
+    path = tmp_path / 'runtime'
+    ensure_private_dir(str(path))
+    assert path.stat().st_mode & 0o777 == 0o700
+    ensure_private_dir(str(path))  # An existing private directory is fine
+
+def test_rejects_a_shared_directory(tmp_path):
+    path = tmp_path / 'runtime'
+    path.mkdir(mode=0o700)
+    path.chmod(0o777)
+    with pytest.raises(PermissionError):
+        ensure_private_dir(str(path))
+
+def test_rejects_a_symlink(tmp_path):
+    target = tmp_path / 'elsewhere'
+    target.mkdir(mode=0o700)
+    (tmp_path / 'runtime').symlink_to(target)
+    with pytest.raises(PermissionError):
+        ensure_private_dir(str(tmp_path / 'runtime'))
+
+@pytest.mark.skipif(os.getuid() != 0, reason="needs root to hand a directory to another user")
+def test_rejects_another_users_directory(tmp_path):
+    path = tmp_path / 'runtime'
+    path.mkdir(mode=0o700)
+    os.chown(path, 65534, 65534)
+    with pytest.raises(PermissionError):
+        ensure_private_dir(str(path))
+
+def test_client_ignores_a_socket_in_a_shared_directory(tmp_path, monkeypatch):
+    runtime = tmp_path / 'runtime'
+    runtime.mkdir(mode=0o700)
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(runtime))
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(pomotimer_client.daemon_socket_path())
+        server.listen(1)
+        connected = daemon_connect()
+        assert connected is not None
+        connected.close()
+        runtime.chmod(0o777)
+        assert daemon_connect() is None
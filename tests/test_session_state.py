@@ -0,0 +1,103 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from pomotimer_core import SESSION_TRANSITIONS, SessionState
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(os.path.dirname(TESTS_DIR), 'pomotimer.py')
+
+# The golden trace: a work session paused for ten seconds, yes to another run, a
+# work-wait ended by P after five seconds, then no. After an intended change of
+# behavior, regenerate it with `python3 pomotimer.py <GOLDEN_ARGS> > tests/data/simulate_tpom.jsonl`.
+GOLDEN_ARGS = ['simulate', 'tpom', '1m', '30s', '1', '--keys', 'p@20s,p@30s,y@75s,p@110s,n@180s']
+GOLDEN_TRACE = os.path.join(TESTS_DIR, 'data', 'simulate_tpom.jsonl')
+
+ALL_EVENTS = sorted({event for events in SESSION_TRANSITIONS.values() for event in events})
+
+@pytest.mark.parametrize('state', SESSION_TRANSITIONS)
+@pytest.mark.parametrize('event', ALL_EVENTS)
+def test_every_state_and_event(state, event):
+    session = SessionState(4, state=state, session=2)
+    target = SESSION_TRANSITIONS[state].get(event)
+    if target is None:
+        with pytest.raises(ValueError):
+            session.fire(event)
+        assert (session.state, session.session, session.sessions) == (state, 2, 4)
+        return
+    assert session.fire(event) == target
+    assert session.state == target
+    # Entering work starts the next session, yes adds one to the run
+    assert session.session == (3 if target == 'work' else 2)
+    assert session.sessions == (5 if event == 'yes' else 4)
+
+def test_every_state_reaches_done():
+    # Breadth-first over the graph: no state is a dead end except done
+    reached = {'work'}
+    frontier = ['work']
+    while frontier:
+        state = frontier.pop()
+        for target in SESSION_TRANSITIONS[state].values():
+            if target not in reached:
+                reached.add(target)
+                frontier.append(target)
+    assert reached == set(SESSION_TRANSITIONS)
+    assert [state for state, events in SESSION_TRANSITIONS.items() if not events] == ['done']
+
+@pytest.mark.parametrize('autostart, expected', [(False, 'break-wait'), (True, 'break')])
+def test_finish_work_before_the_last_session(autostart, expected):
+    session = SessionState(2, autostart)
+    assert session.finish() == expected
+    assert session.session == 1
+
+@pytest.mark.parametrize('autostart', [False, True])
+def test_finish_last_work_session_asks_to_continue(autostart):
+    session = SessionState(2, autostart, state='work', session=2)
+    assert session.finish() == 'ask-continue'
+
+@pytest.mark.parametrize('autostart, expected', [(False, 'work-wait'), (True, 'work')])
+def test_finish_break(autostart, expected):
+    session = SessionState(2, autostart, state='break', session=1)
+    assert session.finish() == expected
+    assert session.session == (2 if expected == 'work' else 1)
+
+@pytest.mark.parametrize('state', ['break-wait', 'work-wait', 'ask-continue', 'done'])
+def test_finish_only_ends_counting_states(state):
+    with pytest.raises(ValueError):
+        SessionState(2, state=state, session=1).finish()
+
+def test_full_run_with_autostart():
+    session = SessionState(3, autostart=True)
+    states = [session.state]
+    while session.state != 'ask-continue':
+        states.append(session.finish())
+    assert states == ['work', 'break', 'work', 'break', 'work', 'ask-continue']
+    assert session.session == 3
+    session.fire('no')
+    assert session.state == 'done'
+
+def test_defaults():
+    assert SessionState(4).to_dict() == {'state': 'work', 'session': 1, 'sessions': 4, 'autostart': False}
+    assert SessionState(0).to_dict() == {'state': 'done', 'session': 0, 'sessions': 0, 'autostart': False}
+    with pytest.raises(ValueError):
+        SessionState(4, state='lunch')
+
+@pytest.mark.parametrize('state', SESSION_TRANSITIONS)
+@pytest.mark.parametrize('autostart', [False, True])
+def test_dict_round_trip(state, autostart):
+    session = SessionState(5, autostart, state, 3)
+    data = session.to_dict()
+    restored = SessionState.from_dict(json.loads(json.dumps(data)))
+    assert restored.to_dict() == data
+    for event in SESSION_TRANSITIONS[state]:
+        assert SessionState.from_dict(data).fire(event) == SessionState(5, autostart, state, 3).fire(event)
+
+def test_golden_simulation_trace():
+    result = subprocess.run([sys.executable, SCRIPT, *GOLDEN_ARGS], capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    with open(GOLDEN_TRACE, encoding='utf-8') as f:
+        expected = [json.loads(line) for line in f]
+    assert [json.loads(line) for line in result.stdout.splitlines()] == expected
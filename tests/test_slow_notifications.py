@@ -0,0 +1,64 @@
+import os
+import re
+import subprocess
+import sys
+import time
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(os.path.dirname(TESTS_DIR), 'pomotimer.py')
+NOTIFY_DELAY = 3
+# Every notification takes NOTIFY_DELAY seconds; --help answers at once, so the
+# capability probe before the timer isn't slowed down
+FAKE_NOTIFY_SEND = f"""#!/bin/sh
+case "$*" in *--help*) echo "--print-id --replace-id"; exit 0;; esac
+echo "$(date +%s.%N) $*" >> "$(dirname "$0")/notify.log"
+sleep {NOTIFY_DELAY}
+echo 1
+"""
+FRAME = re.compile(rb'(\d\d):(\d\d)\x1b\[0m \[')
+
+def test_ticks_stay_steady_with_a_slow_notify_send(tmp_path):
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    fake = bin_dir / 'notify-send'
+    fake.write_text(FAKE_NOTIFY_SEND)
+    fake.chmod(0o755)
+    runtime = tmp_path / 'runtime'
+    runtime.mkdir(mode=0o700)
+    env = dict(os.environ, PATH=f"{bin_dir}{os.pathsep}{os.environ['PATH']}", XDG_RUNTIME_DIR=str(runtime),
+               XDG_CACHE_HOME=str(tmp_path / 'cache'), XDG_STATE_HOME=str(tmp_path / 'state'),
+               POMOTIMER_PLAYER='pomotimer-test-no-player', POMOTIMER_NOTIFY_BACKEND='auto')
+    env.pop('DBUS_SESSION_BUS_ADDRESS', None)  # No bus: notifications go through notify-send
+
+    # A 1 second work session, whose end notification is sent while the 4 second break counts down
+    process = subprocess.Popen([sys.executable, SCRIPT, 'tpom', '1s', '4s', '2'], env=env,
+                               stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    frames = []
+    buffer = b''
+    in_break = False
+    try:
+        while True:
+            chunk = os.read(process.stdout.fileno(), 4096)
+            if not chunk:
+                break
+            received = time.monotonic()
+            buffer += chunk
+            *lines, buffer = re.split(rb'[\r\n]', buffer)
+            for line in lines:
+                if b'--- Break 1 ---' in line:
+                    in_break = True
+                elif b'--- Work Session 2 ---' in line:
+                    in_break = False
+                match = FRAME.search(line)
+                if in_break and match:
+                    frames.append((received, int(match.group(1)) * 60 + int(match.group(2))))
+    finally:
+        process.stdout.close()
+        process.wait(timeout=30)
+
+    log = (bin_dir / 'notify.log').read_text()
+    assert 'Work session 1 complete' in log
+    # One frame per second of the break, from 00:04 down to 00:00, each about a second apart
+    assert [remaining for _, remaining in frames] == [4, 3, 2, 1, 0]
+    gaps = [later - earlier for (earlier, _), (later, _) in zip(frames, frames[1:])]
+    assert all(0.5 < gap < 1.5 for gap in gaps), gaps
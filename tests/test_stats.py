@@ -0,0 +1,85 @@
+import json
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+from pomotimer_core import Rollups, day_number
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pomotimer.py')
+# Noon, so the local day doesn't depend on the time zone the tests run in
+NOON = 1760097600
+
+def work_entry(ts, planned=1500, **fields):
+    return {'ts': ts, 'kind': 'tpom', 'phase': 'work', 'planned': planned, 'actual': planned,
+            'overdue': 0, 'pauses': 0, **fields}
+
+def write_history(path, entries):
+    with open(path, 'a') as f:
+        for entry in entries:
+            f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+
+def test_reversed_range_queries_nothing(tmp_path):
+    history = tmp_path / 'history.jsonl'
+    write_history(history, [work_entry(NOON + day * 86400) for day in range(5)])
+    rollups = Rollups(str(tmp_path / 'history.days'), str(history))
+    rollups.refresh()
+    today = day_number(NOON)
+    assert len(rollups.query(today, today + 4)) == 5
+    assert rollups.query(today + 3, today + 1) == []
+    assert rollups.query(today + 1, today) == []
+
+def test_reversed_range_is_an_error(tmp_path):
+    env = dict(os.environ, XDG_STATE_HOME=str(tmp_path))
+    result = subprocess.run([sys.executable, SCRIPT, 'stats', '--range', '2026-10-16:2026-10-12'],
+                            capture_output=True, text=True, env=env, timeout=60)
+    assert result.returncode == 1
+    assert 'Invalid range' in result.stdout
+    assert 'Traceback' not in result.stderr
+
+def random_lines(rng, today):
+    """History lines for a few random days, mostly recent, some junk"""
+    lines = []
+    for _ in range(rng.randint(1, 30)):
+        ts = NOON + (today - day_number(NOON) - rng.choice([0, 0, 0, 1, 2, rng.randint(3, 40)])) * 86400
+        choice = rng.random()
+        if choice < 0.5:
+            fields = {'cancelled': True, 'actual': rng.randint(0, 1500)} if rng.random() < 0.2 else {}
+            entry = work_entry(ts, **fields)
+        elif choice < 0.8:
+            overdue = rng.randint(0, 600)
+            entry = {'ts': ts, 'kind': 'tpom', 'phase': 'break-wait', 'planned': 0, 'actual': overdue,
+                     'overdue': overdue, 'pauses': 0}
+        elif choice < 0.9:
+            entry = {'ts': ts, 'kind': 'tcount', 'phase': 'countdown', 'planned': 60, 'actual': 60,
+                     'overdue': 0, 'pauses': 0}
+        else:
+            lines.append('{"ts": "work", broken\n')
+            continue
+        lines.append(json.dumps(entry, separators=(',', ':')) + '\n')
+    return lines
+
+@pytest.mark.parametrize('seed', range(3))
+def test_incremental_refresh_matches_a_rebuild(tmp_path, seed):
+    rng = random.Random(seed)
+    history = tmp_path / 'history.jsonl'
+    history.touch()
+    rollups = Rollups(str(tmp_path / 'history.days'), str(history))
+    today = day_number(NOON) + 100
+    for round_number in range(20):
+        today += rng.choice([0, 0, 1, 2])
+        text = ''.join(random_lines(rng, today))
+        # Sometimes the last line is still being written when stats run
+        cut = rng.randrange(len(text)) if rng.random() < 0.3 else len(text)
+        with open(history, 'a') as f:
+            f.write(text[:cut])
+        rollups.refresh()
+        with open(history, 'a') as f:
+            f.write(text[cut:])
+        rebuilt = Rollups(str(tmp_path / f'rebuilt-{round_number}.days'), str(history))
+        rollups.refresh()
+        rebuilt.refresh()
+        assert rollups.query(0, today) == rebuilt.query(0, today)
+        assert rollups.streak(today) == rebuilt.streak(today)
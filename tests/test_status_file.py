@@ -0,0 +1,52 @@
+import os
+
+from pomotimer_client import STATUS_SEQ, StatusReader, read_status
+from pomotimer_core import StatusFile
+
+def test_update_publishes_the_timer(tmp_path):
+    runtime = tmp_path / 'runtime'
+    status = StatusFile(str(runtime / 'pomotimer.status'))
+    status.update(phase='work', kind='tpom', session=1, sessions=4, total=1500)
+    assert read_status(status.path)['phase'] == 'work'
+    assert runtime.stat().st_mode & 0o777 == 0o700
+    status.clear()
+    assert read_status(status.path) is None
+
+def test_planted_symlink_is_not_followed(tmp_path):
+    runtime = tmp_path / 'runtime'
+    runtime.mkdir(mode=0o700)
+    victim = tmp_path / 'victim.txt'
+    victim.write_text('precious\n' * 100)
+    (runtime / 'pomotimer.status').symlink_to(victim)
+    status = StatusFile(str(runtime / 'pomotimer.status'))
+    status.update(phase='work', kind='tpom')
+    assert status.failed
+    assert victim.read_text() == 'precious\n' * 100
+    assert read_status(status.path) is None
+
+def test_shared_directory_is_not_used(tmp_path):
+    runtime = tmp_path / 'runtime'
+    runtime.mkdir()
+    runtime.chmod(0o777)
+    status = StatusFile(str(runtime / 'pomotimer.status'))
+    status.update(phase='work', kind='tpom')
+    assert status.failed
+    assert not os.path.exists(status.path)
+
+def test_record_mid_write_reads_as_none(tmp_path):
+    runtime = tmp_path / 'runtime'
+    status = StatusFile(str(runtime / 'pomotimer.status'))
+    status.update(phase='work', kind='tpom', session=1, sessions=4, total=1500)
+    reader = StatusReader(status.path)
+    seq = STATUS_SEQ.unpack_from(reader.map, 0)[0]
+    assert seq % 2 == 0
+    # A writer that died, or is still writing, between its two sequence number bumps
+    fd = os.open(status.path, os.O_WRONLY)
+    try:
+        os.pwrite(fd, STATUS_SEQ.pack(seq + 1), 0)
+        assert reader.read() is None
+        os.pwrite(fd, STATUS_SEQ.pack(seq + 2), 0)
+        assert reader.read()['phase'] == 'work'
+    finally:
+        os.close(fd)
+        reader.close()
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from pomotimer_core import ANSI_TOKEN, Colors, get_visual_length, plain_width, truncate_visual
+
+STYLES = [Colors.RED, Colors.GREEN, Colors.BOLD, Colors.ENDC, '\x1b[38;5;208m', '\x1b[?25l']
+# ASCII, a combining mark, CJK and emoji (two cells each), and a zero-width joiner
+CHARS = 'abc xyz:▌' + 'é' + '漢字' + '🍅' + '‍'
+
+def random_styled(rng):
+    pieces = []
+    for _ in range(rng.randrange(12)):
+        if rng.random() < 0.3:
+            pieces.append(rng.choice(STYLES))
+        else:
+            pieces.append(''.join(rng.choice(CHARS) for _ in range(rng.randrange(8))))
+    return ''.join(pieces)
+
+def check_truncated(text, max_width, ellipsis='...'):
+    result = truncate_visual(text, max_width, ellipsis)
+    if get_visual_length(text) <= max_width:
+        assert result == text
+        return
+    assert get_visual_length(result) <= max_width
+    shown = ellipsis[:max_width]
+    assert result.endswith(shown)
+    kept = result[:len(result) - len(shown)]
+    if kept.endswith(Colors.ENDC) and not text.startswith(kept):
+        kept = kept[:-len(Colors.ENDC)]
+    # Everything before the ellipsis is a prefix of the input, escapes included
+    assert text.startswith(kept)
+    # ... and the longest one that fits: the next visible character would not
+    limit = max(max_width - len(ellipsis), 0)
+    plain, kept_plain = ANSI_TOKEN.sub('', text), ANSI_TOKEN.sub('', kept)
+    assert plain_width(kept_plain) <= limit
+    assert plain_width(plain[:len(kept_plain) + 1]) > limit
+
+@pytest.mark.parametrize('seed', range(20))
+def test_random_styled_strings(seed):
+    rng = random.Random(seed)
+    for _ in range(200):
+        text = random_styled(rng)
+        check_truncated(text, rng.randrange(40), rng.choice(['...', '…', '']))
+
+def test_escape_sequences_take_no_width():
+    # The old loop compared a 4-character slice with '\x1b[' and never matched,
+    # so escape bytes were counted as visible and lines were cut too early
+    text = f"{Colors.BOLD}{Colors.RED}{'x' * 20}{Colors.ENDC}"
+    assert truncate_visual(text, 20) == text
+    assert truncate_visual(text, 10) == f"{Colors.BOLD}{Colors.RED}{'x' * 7}{Colors.ENDC}..."
+
+def test_escape_sequence_is_never_split():
+    text = f"ab{Colors.GREEN}cdef"
+    for max_width in range(8):
+        result = truncate_visual(text, max_width)
+        assert ANSI_TOKEN.sub('', result).count('\x1b') == 0
+
+def test_wide_characters():
+    assert truncate_visual('漢字漢字', 6) == '漢...'
+    assert truncate_visual('漢字漢字', 7) == '漢字漢字'[:2] + '...'
+
+def test_width_smaller_than_ellipsis():
+    assert truncate_visual('abcdef', 2) == '..'
+    assert truncate_visual('abcdef', 0) == ''